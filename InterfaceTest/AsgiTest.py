@@ -0,0 +1,156 @@
+import unittest
+import asyncio
+import threading
+import flask
+
+
+def call_asgi(app, path, method='GET', body=b'', headers=()):
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        scope = {'type': 'http', 'method': method, 'path': path,
+                 'query_string': b'', 'headers': list(headers)}
+        await app.asgi_app(scope, receive, send)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    body = b''.join(m.get('body', b'') for m in sent[1:])
+    return sent[0]['status'], dict(sent[0]['headers']), body, loop_thread
+
+
+class AsgiTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.secret_key = 'testing'
+        self.threads = {}
+
+    def record(self, name):
+        self.threads[name] = threading.get_ident()
+
+    def test_sync_and_async_views(self):
+        @self.app.route('/sync')
+        def sync_view():
+            self.record('view')
+            return 'sync'
+
+        @self.app.route('/async')
+        async def async_view():
+            return 'async'
+
+        status, headers, body, loop_thread = call_asgi(self.app, '/sync')
+        assert (status, body) == (200, b'sync')
+        assert self.threads['view'] != loop_thread
+        status, headers, body, loop_thread = call_asgi(self.app, '/async')
+        assert (status, body) == (200, b'async')
+
+    def test_sync_hooks_off_the_loop(self):
+        @self.app.before_request
+        def before():
+            self.record('before')
+
+        @self.app.after_request
+        def after(response):
+            self.record('after')
+            response.headers['X-After'] = flask.request.path
+            return response
+
+        @self.app.route('/')
+        def index():
+            flask.session['x'] = 1
+            return 'index'
+
+        save_session = self.app.save_session
+
+        def recording_save_session(session, response):
+            self.record('save_session')
+            return save_session(session, response)
+        self.app.save_session = recording_save_session
+
+        status, headers, body, loop_thread = call_asgi(self.app, '/')
+        assert (status, body) == (200, b'index')
+        assert headers[b'x-after'] == b'/'
+        assert b'set-cookie' in headers
+        for name in 'before', 'after', 'save_session':
+            assert self.threads[name] != loop_thread, name
+
+    def test_async_hooks(self):
+        @self.app.before_request
+        async def before():
+            if flask.request.path == '/stop':
+                return 'stopped'
+
+        @self.app.route('/stop')
+        def stop():
+            return 'not reached'
+
+        status, headers, body, loop_thread = call_asgi(self.app, '/stop')
+        assert body == b'stopped'
+
+    def test_streamed_body_off_the_loop(self):
+        @self.app.route('/stream')
+        def stream():
+            def generate():
+                self.record('stream')
+                yield flask.request.path
+                yield '!'
+            return generate()
+
+        status, headers, body, loop_thread = call_asgi(self.app, '/stream')
+        assert (status, body) == (200, b'/stream!')
+        assert self.threads['stream'] != loop_thread
+
+    def test_not_found(self):
+        status, headers, body, loop_thread = call_asgi(self.app, '/missing')
+        assert status == 404
+
+
+class WsgiAsyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.loops = []
+
+    def test_one_loop_per_request(self):
+        @self.app.before_request
+        async def before():
+            self.loops.append(asyncio.get_running_loop())
+            # 钩子里创建的和事件循环绑定的对象可以在视图中使用
+            flask.g.queue = asyncio.Queue()
+            await flask.g.queue.put('hook')
+
+        @self.app.route('/')
+        async def index():
+            self.loops.append(asyncio.get_running_loop())
+            return await flask.g.queue.get()
+
+        @self.app.after_request
+        async def after(response):
+            self.loops.append(asyncio.get_running_loop())
+            return response
+
+        c = self.app.test_client()
+        assert c.get('/').data == b'hook'
+        assert len(self.loops) == 3
+        assert self.loops[0] is self.loops[1] is self.loops[2]
+        assert self.loops[0].is_closed()
+        assert c.get('/').data == b'hook'
+        assert self.loops[3] is not self.loops[0]
+
+    def test_sync_request_has_no_loop(self):
+        @self.app.route('/')
+        def index():
+            return str(flask._request_ctx_stack.top.event_loop)
+
+        assert self.app.test_client().get('/').data == b'None'
+
+
+if __name__ == "__main__":
+    unittest.main()
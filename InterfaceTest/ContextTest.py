@@ -0,0 +1,102 @@
+import unittest
+import asyncio
+import threading
+import flask
+from unittest import mock
+
+
+class LazyContextTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.secret_key = 'testing'
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        @self.app.route('/user/<name>')
+        def user(name):
+            return name
+
+    def test_members_created_on_access(self):
+        with self.app.test_request_context('/'):
+            ctx = flask._request_ctx_stack.top
+            for name in 'url_adapter', 'request', 'session', 'g':
+                assert name not in ctx.__dict__, name
+            assert flask.request.endpoint == 'index'
+            assert 'request' in ctx.__dict__
+            assert not ctx.session_loaded
+            flask.session.get('x')
+            assert ctx.session_loaded
+
+    def test_static_url_does_not_bind_adapter(self):
+        with self.app.test_request_context('/'):
+            ctx = flask._request_ctx_stack.top
+            assert flask.request.endpoint == 'index'
+            assert 'url_adapter' not in ctx.__dict__
+        with self.app.test_request_context('/user/bob'):
+            ctx = flask._request_ctx_stack.top
+            assert flask.request.view_args == {'name': 'bob'}
+            assert 'url_adapter' in ctx.__dict__
+
+    def test_unused_session_not_opened(self):
+        with mock.patch.object(self.app, 'open_session') as open_session:
+            rv = self.app.test_client().get('/')
+            assert rv.data == b'index'
+            assert not open_session.called
+
+    def test_routing_exception(self):
+        with self.app.test_request_context('/missing'):
+            assert flask.request.endpoint is None
+            assert flask.request.routing_exception.code == 404
+
+
+class ContextStackTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+
+    def test_outside_request(self):
+        assert flask._request_ctx_stack.top is None
+        self.assertRaises(RuntimeError, lambda: flask.request.path)
+
+    def test_nested(self):
+        with self.app.test_request_context('/a'):
+            with self.app.test_request_context('/b'):
+                assert flask.request.path == '/b'
+            assert flask.request.path == '/a'
+        assert flask._request_ctx_stack.top is None
+
+    def test_copy_current_request_context(self):
+        with self.app.test_request_context('/a'):
+            func = flask.copy_current_request_context(
+                lambda: flask.request.path)
+        rv = []
+        thread = threading.Thread(target=lambda: rv.append(func()))
+        thread.start()
+        thread.join()
+        assert rv == ['/a']
+
+    def test_tasks_inherit_context(self):
+
+        async def path():
+            return flask.request.path
+
+        async def run():
+            with self.app.test_request_context('/a'):
+                return await asyncio.ensure_future(path())
+        assert asyncio.run(run()) == '/a'
+
+    def test_threads_do_not_share_context(self):
+        rv = []
+        with self.app.test_request_context('/a'):
+            thread = threading.Thread(
+                target=lambda: rv.append(flask._request_ctx_stack.top))
+            thread.start()
+            thread.join()
+        assert rv == [None]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import flask
+
+
+class HookPipelineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.calls = []
+        calls = self.calls
+
+        @self.app.before_request
+        def app_before():
+            calls.append('app_before')
+
+        @self.app.after_request
+        def app_after(response):
+            calls.append('app_after')
+            return response
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        admin = flask.Module(__name__, 'admin')
+
+        @admin.before_request
+        def admin_before():
+            calls.append('admin_before')
+
+        @admin.after_request
+        def admin_after(response):
+            calls.append('admin_after')
+            return response
+
+        @admin.route('/')
+        def admin_index():
+            return 'admin'
+
+        self.app.register_module(admin, url_prefix='/admin')
+
+    def get(self, path):
+        del self.calls[:]
+        return self.app.test_client().get(path).data
+
+    def test_order(self):
+        assert self.get('/') == b'index'
+        assert self.calls == ['app_before', 'app_after']
+        assert self.get('/admin/') == b'admin'
+        assert self.calls == ['app_before', 'admin_before', 'admin_after',
+                              'app_after']
+
+    def test_pipeline_cached(self):
+        pipeline = self.app.get_pipeline('admin.admin_index')
+        assert pipeline.module == 'admin'
+        assert self.app.get_pipeline('admin.admin_index') is pipeline
+        assert len(self.app.get_pipeline('index').before_request_funcs) == 1
+
+    def test_reset_on_new_hook(self):
+        assert self.get('/') == b'index'
+
+        @self.app.before_request
+        def late():
+            self.calls.append('late')
+
+        assert self.get('/') == b'index'
+        assert self.calls == ['app_before', 'late', 'app_after']
+
+    def test_reset_pipelines(self):
+        assert self.get('/') == b'index'
+        self.app.before_request_funcs[None].append(
+            lambda: self.calls.append('direct'))
+        assert self.get('/') == b'index'
+        assert 'direct' not in self.calls
+        self.app.reset_pipelines()
+        assert self.get('/') == b'index'
+        assert 'direct' in self.calls
+
+    def test_before_request_stops(self):
+        @self.app.before_request
+        def stop():
+            return 'stopped'
+        assert self.get('/') == b'stopped'
+
+    def test_not_found_uses_global_hooks(self):
+        self.get('/missing')
+        assert self.calls == ['app_before', 'app_after']
+
+
+if __name__ == "__main__":
+    unittest.main()
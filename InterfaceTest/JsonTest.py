@@ -0,0 +1,156 @@
+import unittest
+import datetime
+import uuid
+import flask
+
+
+class JsonTestBase(object):
+    use_orjson = False
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.json.use_orjson = self.use_orjson
+
+    def dumps(self, obj):
+        with self.app.test_request_context():
+            return self.app.json.dumps(obj)
+
+    def test_compact(self):
+        assert self.dumps({'a': [1, 2]}) == '{"a":[1,2]}'
+
+    def test_indent(self):
+        self.app.json.compact = False
+        assert self.dumps({'a': 1}) == '{\n  "a": 1\n}'
+
+    def test_non_str_keys(self):
+        assert self.dumps({1: 'a'}) == '{"1":"a"}'
+
+    def test_non_ascii(self):
+        assert self.dumps(u'\xe9') == u'"\xe9"'
+
+    def test_big_int(self):
+        assert self.dumps(2 ** 70) == str(2 ** 70)
+
+    def test_registered_date(self):
+        self.app.json.register(datetime.date, lambda d: d.strftime('%d.%m.%Y'))
+        assert self.dumps(datetime.date(2020, 1, 2)) == '"02.01.2020"'
+
+    def test_registered_uuid(self):
+        value = uuid.UUID(int=1)
+        self.app.json.register(uuid.UUID, lambda u: u.int)
+        assert self.dumps(value) == '1'
+
+    def test_non_finite_floats(self):
+        value = [float('nan'), float('inf'), -float('inf'), None]
+        assert self.dumps(value) == '[NaN,Infinity,-Infinity,null]'
+
+    def test_small_floats(self):
+        value = [1e-7, 1.5e-10, 1e16, 0.1]
+        assert self.app.json.loads(self.dumps(value)) == value
+
+    def test_unknown_type(self):
+        self.assertRaises(TypeError, self.dumps, object())
+
+    def test_loads(self):
+        assert self.app.json.loads(b'{"a": [1, 2]}') == {'a': [1, 2]}
+        assert self.app.json.loads(str(2 ** 70)) == 2 ** 70
+
+    def test_jsonify(self):
+        @self.app.route('/')
+        def index():
+            return flask.jsonify({1: 'a'})
+        rv = self.app.test_client().get('/')
+        assert rv.status_code == 200
+        assert rv.data == b'{"1":"a"}'
+
+    def test_request_json(self):
+        @self.app.route('/', methods=['POST'])
+        def index():
+            return flask.jsonify(value=flask.request.json)
+        rv = self.app.test_client().post('/', data='[1, "x"]',
+                                         content_type='application/json')
+        assert rv.data == b'{"value":[1,"x"]}'
+
+    def test_tojson_filter(self):
+        with self.app.test_request_context():
+            rv = flask.render_template_string('{{ x|tojson|safe }}',
+                                              x='</script>')
+        assert rv == '"<\\/script>"'
+
+
+class JsonModuleTest(JsonTestBase, unittest.TestCase):
+    use_orjson = False
+
+
+@unittest.skipIf(flask.orjson is None, 'orjson is not installed')
+class OrjsonTest(JsonTestBase, unittest.TestCase):
+    use_orjson = True
+
+    def test_uses_orjson(self):
+        assert self.app.json.use_orjson
+
+
+class StreamJsonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+
+        @self.app.route('/array')
+        def array():
+            return flask.stream_json(({'n': i} for i in range(3)),
+                                     buffer_size=0)
+
+        @self.app.route('/lines')
+        def lines():
+            return flask.stream_json(iter([{'n': 1}, [flask.request.path]]),
+                                     lines=True)
+
+        @self.app.route('/empty')
+        def empty():
+            return flask.stream_json([])
+
+    def get(self, path):
+        return self.app.test_client().get(path)
+
+    def test_array(self):
+        rv = self.get('/array')
+        assert rv.mimetype == 'application/json'
+        assert rv.data == b'[{"n":0},{"n":1},{"n":2}]'
+
+    def test_lines(self):
+        rv = self.get('/lines')
+        assert rv.mimetype == 'application/x-ndjson'
+        assert rv.data == b'{"n":1}\n["/lines"]\n'
+
+    def test_lines_not_indented(self):
+        self.app.json.compact = False
+        assert self.get('/lines').data == b'{"n": 1}\n["/lines"]\n'
+
+    def test_empty(self):
+        assert self.get('/empty').data == b'[]'
+
+    def test_streamed(self):
+        with self.app.test_request_context():
+            rv = flask.stream_json(iter(range(3)), buffer_size=0)
+            assert not rv.is_sequence
+            assert list(rv.response) == ['[', '0', ',1', ',2', ']']
+
+    def test_closes_iterable(self):
+        closed = []
+
+        def generate():
+            try:
+                yield 1
+                yield 2
+            finally:
+                closed.append(True)
+        with self.app.test_request_context():
+            rv = flask.stream_json(generate())
+            iterator = iter(rv.response)
+            next(iterator)
+            rv.response.close()
+        assert closed == [True]
+
+
+if __name__ == "__main__":
+    unittest.main()
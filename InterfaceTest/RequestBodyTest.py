@@ -0,0 +1,156 @@
+import unittest
+import asyncio
+import io
+import flask
+from werkzeug.test import create_environ, run_wsgi_app
+
+
+class RequestBodyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.max_content_length = 64
+
+        @self.app.route('/json', methods=['POST'])
+        def json_view():
+            return flask.jsonify(value=flask.request.json)
+
+        @self.app.route('/iter', methods=['POST'])
+        def iter_view():
+            lines = flask.request.args.get('lines')
+            if lines is not None:
+                lines = lines == '1'
+            chunk_size = int(flask.request.args.get('chunk_size', 16384))
+            return flask.jsonify(value=list(flask.request.iter_json(
+                lines=lines, chunk_size=chunk_size)))
+
+    def chunked(self, path, data, content_type='application/json'):
+        """Sends `data` like a chunked request, without Content-Length."""
+        environ = create_environ(path, method='POST',
+                                 content_type=content_type)
+        environ.pop('CONTENT_LENGTH', None)
+        environ['wsgi.input'] = io.BytesIO(data)
+        environ['wsgi.input_terminated'] = True
+        app_iter, status, headers = run_wsgi_app(self.app, environ)
+        return int(status.split()[0]), b''.join(app_iter)
+
+    def iter_json(self, data, chunk_size, **args):
+        args['chunk_size'] = chunk_size
+        query = '&'.join('%s=%s' % item for item in args.items())
+        return self.chunked('/iter?' + query, data.encode('utf-8'))
+
+    def test_json_over_limit_without_content_length(self):
+        status, body = self.chunked('/json', b'[' + b'1,' * 40 + b'1]')
+        assert status == 413
+        status, body = self.chunked('/json', b'[1, 2]')
+        assert status == 200
+        assert body == b'{"value":[1,2]}'
+
+    def test_iter_json_over_limit_without_content_length(self):
+        status, body = self.chunked('/iter', b'[' + b'1,' * 40 + b'1]')
+        assert status == 413
+
+    def test_over_content_length(self):
+        c = self.app.test_client()
+        rv = c.post('/json', data='[' + '1,' * 40 + '1]',
+                    content_type='application/json')
+        assert rv.status_code == 413
+        rv = c.post('/iter', data='[' + '1,' * 40 + '1]')
+        assert rv.status_code == 413
+
+    def test_array_chunk_boundaries(self):
+        data = u'[1, 22, {"a": "x,]"}, [3], "\xe9"]'
+        for chunk_size in 1, 2, 3, 1000:
+            status, body = self.iter_json(data, chunk_size)
+            assert status == 200, chunk_size
+            assert body == u'{"value":[1,22,{"a":"x,]"},[3],"\xe9"]}' \
+                .encode('utf-8')
+
+    def test_escaped_quotes(self):
+        data = r'["a\\", "b\"]", "\\\""]'
+        for chunk_size in 1, 2, 3, 1000:
+            status, body = self.iter_json(data, chunk_size)
+            assert status == 200, chunk_size
+            assert body == br'{"value":["a\\","b\"]","\\\""]}'
+
+    def test_large_item_decoded_once(self):
+        self.app.max_content_length = None
+        item = {'values': list(range(2000)), 'text': 'x,]}' * 500}
+        data = self.app.json.dumps([item, item]).encode('utf-8')
+        decoded = []
+        loads = self.app.json.loads
+
+        def counting_loads(s):
+            decoded.append(len(s))
+            return loads(s)
+        self.app.json.loads = counting_loads
+        with self.app.test_request_context(
+                '/', method='POST', input_stream=io.BytesIO(data),
+                content_type='application/json'):
+            rv = list(flask.request.iter_json(chunk_size=7))
+        assert rv == [item, item]
+        assert len(decoded) == 2
+
+    def test_empty_array(self):
+        for data in '', '[]', '  [ ] ':
+            for chunk_size in 1, 1000:
+                assert self.iter_json(data, chunk_size) == \
+                    (200, b'{"value":[]}')
+
+    def test_malformed_array(self):
+        for data in '[1,', '[1 2]', '[1] x', '123', '"abc"', '[1,]', '[,1]':
+            for chunk_size in 1, 3, 1000:
+                status, body = self.iter_json(data, chunk_size)
+                assert status == 400, (data, chunk_size)
+
+    def test_lines(self):
+        data = '{"a": 1}\n[1, 2]\n\n[3]\n42\n'
+        for chunk_size in 1, 2, 3, 1000:
+            status, body = self.iter_json(data, chunk_size, lines=1)
+            assert status == 200, chunk_size
+            assert body == b'{"value":[{"a":1},[1,2],[3],42]}'
+
+    def test_two_values_on_a_line(self):
+        for data in '1 2\n', '{"a": 1}{"b": 2}\n3\n':
+            for chunk_size in 1, 1000:
+                status, body = self.iter_json(data, chunk_size, lines=1)
+                assert status == 400, (data, chunk_size)
+
+    def test_lines_from_mimetype(self):
+        status, body = self.chunked('/iter', b'[1]\n[2]\n',
+                                    content_type='application/x-ndjson')
+        assert status == 200
+        assert body == b'{"value":[[1],[2]]}'
+
+    def test_array_mode_forced(self):
+        status, body = self.iter_json('[1]\n[2]\n', 1000, lines=0)
+        assert status == 400
+
+    def test_malformed_lines(self):
+        for data in '{"a": 1}\n{"b"', '1\nx\n', '[1, 2\n':
+            for chunk_size in 1, 3, 1000:
+                status, body = self.iter_json(data, chunk_size, lines=1)
+                assert status == 400, (data, chunk_size)
+
+    def test_asgi_over_limit(self):
+        messages = [{'type': 'http.request', 'body': b'[' + b'1,' * 20,
+                     'more_body': True},
+                    {'type': 'http.request', 'body': b'1,' * 20 + b'1]'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'POST', 'path': '/json',
+                 'query_string': b'',
+                 'headers': [(b'content-type', b'application/json')]}
+        asyncio.run(self.app.asgi_app(scope, receive, send))
+        assert sent[0]['status'] == 413
+        assert len(messages) == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
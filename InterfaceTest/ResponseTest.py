@@ -0,0 +1,208 @@
+import unittest
+import gzip
+import flask
+from werkzeug.exceptions import NotFound
+
+
+class CompressTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.compress_responses = True
+        self.text = 'hello world ' * 100
+
+        @self.app.route('/text')
+        def text():
+            rv = flask.Response(self.text)
+            rv.set_etag('abc')
+            return rv
+
+        @self.app.route('/small')
+        def small():
+            return 'small'
+
+        @self.app.route('/stream')
+        def stream():
+            return flask.Response((self.text[i:i + 100]
+                                   for i in range(0, len(self.text), 100)))
+
+        @self.app.route('/png')
+        def png():
+            return flask.Response(b'\0' * 1000, mimetype='image/png')
+
+        @self.app.route('/no-transform')
+        def no_transform():
+            return self.text, 200, {'Cache-Control': 'no-transform'}
+
+    def get(self, path, encoding='gzip'):
+        headers = {}
+        if encoding:
+            headers['Accept-Encoding'] = encoding
+        return self.app.test_client().get(path, headers=headers)
+
+    def test_buffered(self):
+        rv = self.get('/text')
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        assert rv.headers['Vary'] == 'Accept-Encoding'
+        assert rv.headers['Content-Length'] == str(len(rv.data))
+        assert gzip.decompress(rv.data) == self.text.encode('utf-8')
+        assert rv.headers['ETag'] == 'W/"abc"'
+
+    def test_not_accepted(self):
+        rv = self.get('/text', encoding=None)
+        assert 'Content-Encoding' not in rv.headers
+        assert rv.headers['Vary'] == 'Accept-Encoding'
+        assert rv.data == self.text.encode('utf-8')
+        rv = self.get('/text', encoding='gzip;q=0')
+        assert 'Content-Encoding' not in rv.headers
+
+    def test_streamed(self):
+        rv = self.get('/stream')
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in rv.headers
+        assert gzip.decompress(rv.data) == self.text.encode('utf-8')
+
+    def test_skipped(self):
+        for path in '/small', '/png', '/no-transform':
+            rv = self.get(path)
+            assert 'Content-Encoding' not in rv.headers, path
+
+    def test_disabled(self):
+        self.app.compress_responses = False
+        assert 'Content-Encoding' not in self.get('/text').headers
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.calls = []
+
+        @self.app.route('/page/<int:n>')
+        @self.app.cache_response(timeout=60, query_args=['q'])
+        def page(n):
+            self.calls.append(n)
+            return 'page %d %s %d' % (n, flask.request.args.get('q'),
+                                      len(self.calls))
+
+        @self.app.route('/lang')
+        @self.app.cache_response(vary=['Accept-Language'])
+        def lang():
+            self.calls.append('lang')
+            return flask.request.headers.get('Accept-Language', '')
+
+        @self.app.route('/cookie')
+        @self.app.cache_response()
+        def cookie():
+            self.calls.append('cookie')
+            rv = flask.Response('cookie')
+            rv.set_cookie('x', '1')
+            return rv
+
+        @self.app.route('/missing')
+        @self.app.cache_response()
+        def missing():
+            self.calls.append('missing')
+            raise NotFound()
+
+        self.client = self.app.test_client()
+
+    def get(self, path, **headers):
+        return self.client.get(path, headers=headers).data
+
+    def test_cached(self):
+        assert self.get('/page/1') == b'page 1 None 1'
+        assert self.get('/page/1') == b'page 1 None 1'
+        assert self.get('/page/2') == b'page 2 None 2'
+        assert self.calls == [1, 2]
+
+    def test_query_args(self):
+        assert self.get('/page/1?q=a') == b'page 1 a 1'
+        assert self.get('/page/1?q=a&other=x') == b'page 1 a 1'
+        assert self.get('/page/1?q=b') == b'page 1 b 2'
+
+    def test_vary(self):
+        assert self.get('/lang', Accept_Language='de') == b'de'
+        assert self.get('/lang', Accept_Language='en') == b'en'
+        assert self.get('/lang', Accept_Language='de') == b'de'
+        assert self.calls == ['lang', 'lang']
+
+    def test_not_cached(self):
+        self.get('/cookie')
+        self.get('/cookie')
+        self.client.get('/missing')
+        self.client.get('/missing')
+        assert self.calls == ['cookie', 'cookie', 'missing', 'missing']
+        self.client.post('/page/1')
+        assert self.calls[-1] == 'missing'
+
+    def test_invalidate(self):
+        self.get('/page/1')
+        self.app.invalidate_endpoint('page')
+        assert self.get('/page/1') == b'page 1 None 2'
+
+
+class ETagTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.auto_etags = True
+        self.calls = []
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        @self.app.route('/stream')
+        def stream():
+            return flask.Response(iter(['a', 'b']))
+
+        @self.app.route('/item/<int:n>')
+        @flask.with_etag(lambda n: 'item-%d' % n)
+        def item(n):
+            self.calls.append(n)
+            return 'item %d' % n
+
+        self.client = self.app.test_client()
+
+    def test_auto_etag(self):
+        rv = self.client.get('/')
+        etag = rv.headers['ETag']
+        assert etag.startswith('"') and not etag.startswith('W/')
+        rv = self.client.get('/', headers={'If-None-Match': etag})
+        assert rv.status_code == 304
+        assert rv.data == b''
+        rv = self.client.get('/', headers={'If-None-Match': '"other"'})
+        assert rv.status_code == 200
+        assert rv.data == b'index'
+
+    def test_weak(self):
+        self.app.auto_etags_weak = True
+        assert self.client.get('/').headers['ETag'].startswith('W/')
+
+    def test_not_for_streams_and_posts(self):
+        assert 'ETag' not in self.client.get('/stream').headers
+        self.app.add_url_rule('/post', 'post', lambda: 'post',
+                              methods=['POST'])
+        assert 'ETag' not in self.client.post('/post').headers
+
+    def test_not_with_cookies(self):
+        @self.app.route('/cookie')
+        def cookie():
+            rv = flask.Response('cookie')
+            rv.set_cookie('x', '1')
+            return rv
+        assert 'ETag' not in self.client.get('/cookie').headers
+
+    def test_with_etag(self):
+        rv = self.client.get('/item/1')
+        assert rv.data == b'item 1'
+        assert rv.headers['ETag'] == '"item-1"'
+        rv = self.client.get('/item/1', headers={'If-None-Match':
+                                                  '"item-1"'})
+        assert rv.status_code == 304
+        assert self.calls == [1]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+import flask
+from werkzeug.routing import Map, Rule, RequestRedirect
+from werkzeug.exceptions import NotFound, MethodNotAllowed
+
+
+def outcome(url_map, path, method='GET'):
+    adapter = url_map.bind('localhost', '/')
+    try:
+        endpoint, args = adapter.match(path, method)
+    except RequestRedirect as e:
+        return 'redirect', e.new_url
+    except MethodNotAllowed as e:
+        return 405, sorted(e.valid_methods)
+    except NotFound:
+        return 404
+    return endpoint, args
+
+
+class RadixMapTest(unittest.TestCase):
+    """Checks that a :class:`flask.RadixMap` matches like a regular
+    :class:`~werkzeug.routing.Map` with the same rules.
+    """
+
+    def check(self, rules, paths, methods=('GET',)):
+        regular = Map([rule.empty() for rule in rules])
+        radix = flask.RadixMap([rule.empty() for rule in rules])
+        for path in paths:
+            for method in methods:
+                expected = outcome(regular, path, method)
+                assert outcome(radix, path, method) == expected, \
+                    (path, method, expected)
+
+    def test_static(self):
+        self.check([
+            Rule('/', endpoint='index'),
+            Rule('/about', endpoint='about'),
+            Rule('/about/team', endpoint='team')
+        ], ['/', '/about', '/about/team', '/about/team/x', '/missing',
+            '/About', '//about'])
+
+    def test_strict_slashes(self):
+        self.check([
+            Rule('/dir/', endpoint='dir'),
+            Rule('/file', endpoint='file'),
+            Rule('/loose', endpoint='loose', strict_slashes=False),
+            Rule('/user/<name>/', endpoint='user')
+        ], ['/dir', '/dir/', '/file', '/file/', '/loose', '/loose/',
+            '/user/bob', '/user/bob/'])
+
+    def test_methods(self):
+        self.check([
+            Rule('/item', endpoint='read', methods=['GET']),
+            Rule('/item', endpoint='write', methods=['POST', 'PUT']),
+            Rule('/only-post', endpoint='only_post', methods=['POST']),
+            Rule('/thing/<int:id>', endpoint='delete', methods=['DELETE'])
+        ], ['/item', '/only-post', '/thing/1', '/thing/x'],
+            methods=('GET', 'HEAD', 'POST', 'PUT', 'DELETE'))
+
+    def test_converter_priority(self):
+        self.check([
+            Rule('/p/static', endpoint='static'),
+            Rule('/p/<int:id>', endpoint='int'),
+            Rule('/p/<float:value>', endpoint='float'),
+            Rule('/p/<name>', endpoint='string'),
+            Rule('/p/<path:rest>', endpoint='path'),
+            Rule('/p/<int:id>/edit', endpoint='edit')
+        ], ['/p/static', '/p/1', '/p/01', '/p/-1', '/p/1.5', '/p/abc',
+            '/p/a/b', '/p/1/edit', '/p/1/other', '/p/static/x', '/p/'])
+
+    def test_path_converter(self):
+        self.check([
+            Rule('/files/<path:name>', endpoint='file'),
+            Rule('/files/<path:name>/raw', endpoint='raw'),
+            Rule('/files/', endpoint='files')
+        ], ['/files/', '/files/a', '/files/a/b/c', '/files/a/raw',
+            '/files/a/b/raw', '/files/raw'])
+
+    def test_mixed_segments(self):
+        self.check([
+            Rule('/f/<name>.<ext>', endpoint='ext'),
+            Rule('/f/x-<int:n>', endpoint='numbered'),
+            Rule('/f/<a>-<b>', endpoint='pair'),
+            Rule('/f/<name>', endpoint='plain')
+        ], ['/f/a.txt', '/f/x-5', '/f/x-y', '/f/a-b', '/f/a.b.c', '/f/plain',
+            '/f/x-', '/f/.txt'])
+
+    def test_any_and_defaults(self):
+        self.check([
+            Rule('/lang/<any(en, de):lang>', endpoint='lang'),
+            Rule('/page/', endpoint='page', defaults={'n': 1}),
+            Rule('/page/<int:n>', endpoint='page'),
+            Rule('/docs/<path:name>/', endpoint='docs')
+        ], ['/lang/en', '/lang/fr', '/page/', '/page/1', '/page/2',
+            '/docs/a/b', '/docs/a/b/', '/docs/'])
+
+    def test_unicode(self):
+        self.check([
+            Rule(u'/caf\xe9', endpoint='cafe'),
+            Rule('/tag/<name>', endpoint='tag')
+        ], [u'/caf\xe9', u'/tag/\xfcber', '/cafe'])
+
+    def test_flask_app(self):
+        class RadixFlask(flask.Flask):
+            url_map_class = flask.RadixMap
+        app = RadixFlask(__name__)
+
+        @app.route('/user/<int:id>')
+        def user(id):
+            return 'user %d' % id
+
+        @app.route('/user/<name>')
+        def user_by_name(name):
+            return 'name ' + name
+
+        c = app.test_client()
+        assert c.get('/user/1').data == b'user 1'
+        assert c.get('/user/bob').data == b'name bob'
+        assert c.post('/user/1').status_code == 405
+        assert c.get('/missing').status_code == 404
+        with app.test_request_context():
+            assert flask.url_for('user', id=2) == '/user/2'
+
+
+class StaticUrlIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+
+        @self.app.route('/about')
+        def about():
+            return 'about'
+
+        @self.app.route('/<name>')
+        def user(name):
+            return 'user ' + name
+
+        @self.app.route('/page', defaults={'n': 1})
+        @self.app.route('/page/<int:n>')
+        def page(n):
+            return 'page %d' % n
+
+        self.client = self.app.test_client()
+
+    def test_hit(self):
+        assert self.app.match_static_url('/about', 'GET') == ('about', {})
+        assert self.app.match_static_url('/about', 'HEAD') == ('about', {})
+        assert self.client.get('/about').data == b'about'
+
+    def test_fallthrough(self):
+        assert self.app.match_static_url('/bob', 'GET') is None
+        assert self.client.get('/bob').data == b'user bob'
+        # 带默认值的规则交给URL映射处理
+        assert self.app.match_static_url('/page', 'GET') is None
+        assert self.client.get('/page').data == b'page 1'
+
+    def test_method_not_allowed(self):
+        assert self.app.match_static_url('/about', 'POST') is None
+        rv = self.client.post('/about')
+        assert rv.status_code == 405
+        assert 'GET' in rv.headers['Allow']
+
+    def test_add_url_rule(self):
+        self.client.get('/about')
+        self.app.add_url_rule('/about', 'about_post', lambda: 'posted',
+                              methods=['POST'])
+        assert self.client.post('/about').data == b'posted'
+        assert self.client.get('/about').data == b'about'
+        self.app.add_url_rule('/late', 'late', lambda: 'late')
+        assert self.client.get('/late').data == b'late'
+
+    def test_register_module(self):
+        admin = flask.Module(__name__, 'admin')
+
+        @admin.route('/')
+        def index():
+            return 'admin'
+
+        self.app.register_module(admin, url_prefix='/admin')
+        assert self.app.match_static_url('/admin/', 'GET') == \
+            ('admin.index', {})
+        assert self.client.get('/admin/').data == b'admin'
+
+
+if __name__ == "__main__":
+    unittest.main()
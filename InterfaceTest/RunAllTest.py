@@ -12,6 +12,10 @@ class TestWebapps(unittest.TestCase):
         assert b'Hello world' in rv.data
         logging.info('response code : %d',rv._status_code)
 
+    def test_index_method_not_allowed(self):
+        rv = self.app.post('/index')
+        assert rv._status_code == 405
+
     def test_index_username(self):
         rv = self.app.get('/user/testuser1/')
         assert rv._status_code == 200
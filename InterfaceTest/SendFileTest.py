@@ -0,0 +1,109 @@
+import unittest
+import os
+import shutil
+import tempfile
+import flask
+from werkzeug.http import http_date
+
+
+class SendFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data = bytes(range(100))
+        with open(os.path.join(self.root, 'data.bin'), 'wb') as f:
+            f.write(self.data)
+        self.app = flask.Flask(__name__)
+        self.app.root_path = self.root
+
+        @self.app.route('/')
+        def index():
+            return flask.send_file('data.bin')
+
+        @self.app.route('/unconditional')
+        def unconditional():
+            return flask.send_file('data.bin', conditional=False)
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def get(self, path='/', **headers):
+        rv = self.client.get(path, headers=headers)
+        # 先读出响应体，再关闭打开的文件
+        rv.get_data()
+        rv.close()
+        return rv
+
+    def test_full(self):
+        rv = self.get()
+        assert rv.status_code == 200
+        assert rv.data == self.data
+        assert rv.headers['Accept-Ranges'] == 'bytes'
+        assert rv.headers['Content-Length'] == '100'
+
+    def test_not_modified(self):
+        etag = self.get().headers['ETag']
+        rv = self.get(If_None_Match=etag)
+        assert rv.status_code == 304
+        assert rv.data == b''
+        last_modified = self.get().headers['Last-Modified']
+        rv = self.get(If_Modified_Since=last_modified)
+        assert rv.status_code == 304
+
+    def test_single_range(self):
+        rv = self.get(Range='bytes=10-19')
+        assert rv.status_code == 206
+        assert rv.data == self.data[10:20]
+        assert rv.headers['Content-Range'] == 'bytes 10-19/100'
+        assert rv.headers['Content-Length'] == '10'
+        rv = self.get(Range='bytes=-5')
+        assert rv.status_code == 206
+        assert rv.data == self.data[95:]
+        rv = self.get(Range='bytes=90-')
+        assert rv.data == self.data[90:]
+
+    def test_multiple_ranges(self):
+        rv = self.get(Range='bytes=0-1,50-51')
+        assert rv.status_code == 206
+        content_type = rv.headers['Content-Type']
+        assert content_type.startswith('multipart/byteranges; boundary=')
+        boundary = content_type.split('=', 1)[1].encode('ascii')
+        assert rv.headers['Content-Length'] == str(len(rv.data))
+        parts = rv.data.split(b'--' + boundary)
+        assert parts[-1] == b'--\r\n'
+        assert b'Content-Range: bytes 0-1/100\r\n\r\n' + self.data[0:2] \
+            in parts[1]
+        assert b'Content-Range: bytes 50-51/100\r\n\r\n' + self.data[50:52] \
+            in parts[2]
+
+    def test_unsatisfiable_range(self):
+        rv = self.get(Range='bytes=200-300')
+        assert rv.status_code == 416
+        assert rv.headers['Content-Range'] == 'bytes */100'
+        assert rv.data == b''
+
+    def test_if_range(self):
+        full = self.get()
+        rv = self.get(Range='bytes=0-9', If_Range=full.headers['ETag'])
+        assert rv.status_code == 206
+        assert rv.data == self.data[:10]
+        rv = self.get(Range='bytes=0-9', If_Range='"other"')
+        assert rv.status_code == 200
+        assert rv.data == self.data
+        rv = self.get(Range='bytes=0-9',
+                      If_Range=full.headers['Last-Modified'])
+        assert rv.status_code == 206
+        rv = self.get(Range='bytes=0-9', If_Range=http_date(0))
+        assert rv.status_code == 200
+
+    def test_unconditional(self):
+        rv = self.get('/unconditional', Range='bytes=0-9')
+        assert rv.status_code == 200
+        assert rv.data == self.data
+        assert 'Accept-Ranges' not in rv.headers
+
+
+if __name__ == "__main__":
+    unittest.main()
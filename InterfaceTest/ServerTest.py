@@ -0,0 +1,250 @@
+import unittest
+import socket
+import threading
+import time
+import http.client
+import logging
+import os
+import signal
+import flask
+
+
+class ThreadPoolServerTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.app = flask.Flask(__name__)
+
+        @self.app.route('/')
+        def index():
+            return 'ok'
+
+        self.server = flask.ThreadPoolServer('127.0.0.1', 0, self.app,
+                                             threads=1, idle_timeout=2)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.thread = thread
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+
+    def connect(self):
+        return http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                          timeout=5)
+
+    def get(self, conn):
+        conn.request('GET', '/')
+        rv = conn.getresponse()
+        return rv.status, rv.read()
+
+    def test_idle_connection_does_not_hold_a_thread(self):
+        first = self.connect()
+        assert self.get(first) == (200, b'ok')
+        start = time.monotonic()
+        second = self.connect()
+        assert self.get(second) == (200, b'ok')
+        assert time.monotonic() - start < 1
+        # 空闲的连接仍然可以继续使用
+        assert self.get(first) == (200, b'ok')
+        first.close()
+        second.close()
+
+    def test_pipelined_requests(self):
+        sock = socket.create_connection(('127.0.0.1', self.server.port), 5)
+        sock.sendall(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n' * 3)
+        data = b''
+        while data.count(b'200 OK') < 3:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        sock.close()
+        assert data.count(b'200 OK') == 3
+
+    def test_idle_timeout(self):
+        self.server.idle_timeout = 0.2
+        sock = socket.create_connection(('127.0.0.1', self.server.port), 5)
+        sock.sendall(b'GET / HTTP/1.1\r\nHost: x\r\n\r\n')
+        data = sock.recv(4096)
+        assert b'200 OK' in data
+        while data:
+            data = sock.recv(4096)
+        sock.close()
+
+
+class LoadSheddingTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.app = flask.Flask(__name__)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+        @self.app.route('/')
+        def index():
+            return 'ok'
+
+        @self.app.route('/block')
+        def block():
+            self.entered.set()
+            self.release.wait(10)
+            return 'done'
+
+        self.server = flask.ThreadPoolServer('127.0.0.1', 0, self.app,
+                                             threads=1, queue_size=1)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.release.set()
+        self.server.shutdown()
+        self.thread.join()
+
+    def connect(self):
+        return http.client.HTTPConnection('127.0.0.1', self.server.port,
+                                          timeout=5)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+
+    def test_full_queue(self):
+        # 第一个连接占用唯一的线程，第二个连接在队列中等待
+        busy = self.connect()
+        busy.request('GET', '/block')
+        self.wait_for(self.entered.is_set)
+        queued = self.connect()
+        queued.request('GET', '/block')
+        self.wait_for(lambda: self.server.queue.qsize() == 1)
+
+        for x in range(3):
+            conn = self.connect()
+            conn.request('GET', '/')
+            rv = conn.getresponse()
+            assert rv.status == 503
+            rv.read()
+            conn.close()
+
+        self.release.set()
+        for conn in busy, queued:
+            rv = conn.getresponse()
+            assert rv.status == 200
+            assert rv.read() == b'done'
+
+        # 保持打开的两个连接不再占用线程和队列
+        self.wait_for(lambda: self.server.queue.qsize() == 0)
+        start = time.monotonic()
+        conn = self.connect()
+        conn.request('GET', '/')
+        rv = conn.getresponse()
+        assert (rv.status, rv.read()) == (200, b'ok')
+        assert time.monotonic() - start < 1
+        conn.close()
+        for conn in busy, queued:
+            conn.request('GET', '/')
+            assert conn.getresponse().read() == b'ok'
+            conn.close()
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+class PreforkServerTest(unittest.TestCase):
+
+    def setUp(self):
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.app = flask.Flask(__name__)
+
+        @self.app.route('/')
+        def index():
+            return str(os.getpid())
+
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self.port = sock.getsockname()[1]
+        sock.close()
+        self.pid = None
+
+    def tearDown(self):
+        if self.pid is not None:
+            os.kill(self.pid, signal.SIGTERM)
+            os.waitpid(self.pid, 0)
+
+    def serve(self, **options):
+        self.pid = os.fork()
+        if not self.pid:
+            status = 0
+            try:
+                self.app.serve('127.0.0.1', self.port, **options)
+            except BaseException:
+                status = 1
+            finally:
+                os._exit(status)
+
+    def get(self):
+        deadline = time.monotonic() + 5
+        while True:
+            conn = http.client.HTTPConnection('127.0.0.1', self.port,
+                                              timeout=5)
+            try:
+                conn.request('GET', '/')
+                rv = conn.getresponse()
+                return rv.status, rv.read()
+            except ConnectionError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+            finally:
+                conn.close()
+
+    def test_workers(self):
+        self.serve(processes=2)
+        status, pid = self.get()
+        assert status == 200
+        assert int(pid) != self.pid
+
+    def test_max_requests(self):
+        self.serve(processes=1, max_requests=1)
+        first = self.get()[1]
+        assert self.get()[1] != first
+
+    def test_threads(self):
+        self.serve(processes=1, threads=2)
+        assert self.get()[0] == 200
+
+    def test_recycle(self):
+        self.serve(processes=1)
+        first = self.get()[1]
+        os.kill(self.pid, signal.SIGHUP)
+        deadline = time.monotonic() + 10
+        while True:
+            status, pid = self.get()
+            assert status == 200
+            if pid != first:
+                break
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+        # 旧的工作进程已经退出
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                os.kill(int(first), 0)
+            except ProcessLookupError:
+                break
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+
+    def test_stop(self):
+        self.serve(processes=1)
+        self.get()
+        os.kill(self.pid, signal.SIGTERM)
+        pid, status = os.waitpid(self.pid, 0)
+        self.pid = None
+        assert os.WEXITSTATUS(status) == 0
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+import datetime
+import flask
+from unittest import mock
+
+
+class SessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.secret_key = 'testing'
+
+        @self.app.route('/set')
+        def set_value():
+            flask.session['value'] = 42
+            flask.session.permanent = True
+            return 'set'
+
+        @self.app.route('/get')
+        def get_value():
+            flask.session.permanent = True
+            return str(flask.session.get('value'))
+
+        @self.app.route('/touch')
+        def touch():
+            flask.session.permanent = False
+            return 'touched'
+
+    def test_permanent_unchanged_is_not_saved(self):
+        c = self.app.test_client()
+        rv = c.get('/set')
+        assert 'Set-Cookie' in rv.headers
+        rv = c.get('/get')
+        assert rv.data == b'42'
+        assert 'Set-Cookie' not in rv.headers
+
+    def test_not_permanent_on_new_session_is_not_saved(self):
+        rv = self.app.test_client().get('/touch')
+        assert 'Set-Cookie' not in rv.headers
+
+    def test_refresh_does_not_change_contents(self):
+        @self.app.route('/keys')
+        def keys():
+            return ','.join(sorted(flask.session.keys()))
+
+        self.app.permanent_session_lifetime = datetime.timedelta(seconds=100)
+        now = [time.time()]
+        c = self.app.test_client()
+        with mock.patch('time.time', lambda: now[0]):
+            c.get('/set')
+            assert c.get('/keys').data == b'_permanent,value'
+            now[0] += 60
+            rv = c.get('/get')
+            assert 'Set-Cookie' in rv.headers
+            assert c.get('/keys').data == b'_permanent,value'
+            # 刚刷新过的session不会再次发送
+            assert 'Set-Cookie' not in c.get('/get').headers
+
+    def test_permanent_property(self):
+        session = flask.Session(secret_key=b'testing')
+        assert not session.permanent
+        session.permanent = False
+        assert not session.modified
+        session.permanent = 1
+        assert session.permanent is True
+        assert session.modified
+
+
+class SessionStoreTestBase(object):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = self.make_store()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_load_delete(self):
+        self.store.save('abc', {'x': 1}, time.time() + 60)
+        assert self.store.load('abc') == {'x': 1}
+        self.store.delete('abc')
+        assert self.store.load('abc') is None
+
+    def test_expired(self):
+        self.store.save('abc', {'x': 1}, time.time() - 1)
+        assert self.store.load('abc') is None
+
+    def test_prune(self):
+        self.store.save('old', {'x': 1}, time.time() - 1)
+        self.store.save('new', {'x': 2}, time.time() + 60)
+        self.store.prune()
+        assert self.store.load('new') == {'x': 2}
+        assert self.store.load('old') is None
+
+    def test_app(self):
+        app = flask.Flask(__name__)
+        app.secret_key = 'testing'
+        app.session_store = self.store
+
+        @app.route('/set')
+        def set_value():
+            flask.session['value'] = 42
+            return 'set'
+
+        @app.route('/get')
+        def get_value():
+            return str(flask.session.get('value'))
+
+        c = app.test_client()
+        c.get('/set')
+        assert c.get('/get').data == b'42'
+
+    def test_read_only_session_refreshed(self):
+        app = flask.Flask(__name__)
+        app.secret_key = 'testing'
+        app.session_store = self.store
+        app.permanent_session_lifetime = datetime.timedelta(seconds=100)
+
+        @app.route('/set')
+        def set_value():
+            flask.session['value'] = 42
+            return 'set'
+
+        @app.route('/get')
+        def get_value():
+            return str(flask.session.get('value'))
+
+        now = [time.time()]
+        c = app.test_client()
+        with mock.patch('time.time', lambda: now[0]):
+            c.get('/set')
+            # 只读取session的活跃用户不会在一个有效期后丢失数据
+            for x in range(4):
+                now[0] += 60
+                assert c.get('/get').data == b'42'
+            now[0] += 101
+            assert c.get('/get').data == b'None'
+
+    def test_refresh_does_not_change_contents(self):
+        app = flask.Flask(__name__)
+        app.secret_key = 'testing'
+        app.session_store = self.store
+
+        @app.route('/set')
+        def set_value():
+            flask.session['value'] = 42
+            return 'set'
+
+        @app.route('/keys')
+        def keys():
+            return ','.join(sorted(flask.session.keys()))
+
+        c = app.test_client()
+        c.get('/set')
+        assert c.get('/keys').data == b'value'
+
+
+class SessionStoreBaseTest(unittest.TestCase):
+
+    def test_abstract(self):
+        self.assertRaises(TypeError, flask.SessionStore)
+
+        class IncompleteStore(flask.SessionStore):
+            def load(self, sid):
+                return None
+        self.assertRaises(TypeError, IncompleteStore)
+
+
+class FileSystemSessionStoreTest(SessionStoreTestBase, unittest.TestCase):
+
+    def make_store(self):
+        return flask.FileSystemSessionStore(self.directory)
+
+    def test_prune_removes_files(self):
+        self.store.save('old', {'x': 1}, time.time() - 1)
+        self.store.save('new', {'x': 2}, time.time() + 60)
+        self.store.prune()
+        assert sorted(os.listdir(self.directory)) == ['flask_session_new']
+
+
+class SQLiteSessionStoreTest(SessionStoreTestBase, unittest.TestCase):
+
+    def make_store(self):
+        return flask.SQLiteSessionStore(os.path.join(self.directory,
+                                                     'sessions.db'))
+
+    def test_prune_removes_rows(self):
+        self.store.save('old', {'x': 1}, time.time() - 1)
+        self.store.save('new', {'x': 2}, time.time() + 60)
+        self.store.prune()
+        rows = self.store._connection().execute(
+            'select sid from %s' % self.store.table).fetchall()
+        assert rows == [('new',)]
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_fork(self):
+        self.store.save('parent', {'x': 1}, time.time() + 60)
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                if self.store.load('parent') == {'x': 1}:
+                    self.store.save('child', {'x': 2}, time.time() + 60)
+                    status = 0
+            finally:
+                os._exit(status)
+        assert os.waitpid(pid, 0)[1] == 0
+        assert self.store.load('child') == {'x': 2}
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+import shutil
+import tempfile
+import flask
+from unittest import mock
+from werkzeug.test import Client
+from werkzeug.wrappers import BaseResponse
+from werkzeug.exceptions import NotFound
+
+
+class StaticFileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write('app.css', 'body { color: red; }\n' * 50)
+        self.write('a.txt', 'a')
+        self.app = flask.Flask(__name__)
+        self.cache = flask.StaticFileCache(self.app, NotFound(),
+                                           '/static', self.directory)
+        self.client = Client(self.cache, BaseResponse)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            f.write(data)
+
+    def test_loaded_lazily(self):
+        assert len(self.cache._files) == 0
+        self.cache.preload()
+        assert len(self.cache._files) == 2
+
+    def test_warm_up_preloads(self):
+        self.app.static_file_cache = self.cache
+        self.app.warm_up()
+        assert len(self.cache._files) == 2
+
+    def test_hit_does_not_stat(self):
+        rv = self.client.get('/static/a.txt')
+        assert rv.status_code == 200
+        assert rv.data == b'a'
+        with mock.patch('os.stat', side_effect=AssertionError):
+            rv = self.client.get('/static/a.txt')
+        assert rv.status_code == 200
+        assert rv.data == b'a'
+
+    def test_debug_reloads(self):
+        self.app.debug = True
+        assert self.client.get('/static/a.txt').data == b'a'
+        self.write('a.txt', 'bb')
+        assert self.client.get('/static/a.txt').data == b'bb'
+
+    def test_changed_file_needs_invalidate(self):
+        assert self.client.get('/static/a.txt').data == b'a'
+        self.write('a.txt', 'bb')
+        assert self.client.get('/static/a.txt').data == b'a'
+        self.cache.invalidate('a.txt')
+        assert self.client.get('/static/a.txt').data == b'bb'
+        self.write('a.txt', 'ccc')
+        self.cache.clear()
+        assert self.cache._memory == 0
+        assert self.client.get('/static/a.txt').data == b'ccc'
+
+    def test_compressed(self):
+        rv = self.client.get('/static/app.css',
+                             headers={'Accept-Encoding': 'gzip'})
+        assert rv.headers['Content-Encoding'] == 'gzip'
+        assert rv.headers['Vary'] == 'Accept-Encoding'
+        rv = self.client.get('/static/app.css')
+        assert 'Content-Encoding' not in rv.headers
+        assert rv.data == b'body { color: red; }\n' * 50
+
+    def test_not_modified(self):
+        rv = self.client.get('/static/a.txt')
+        rv = self.client.get('/static/a.txt', headers={
+            'If-None-Match': rv.headers['ETag']})
+        assert rv.status_code == 304
+
+    def test_missing_and_outside(self):
+        assert self.client.get('/static/missing.txt').status_code == 404
+        assert self.client.get('/static/../../etc/hosts').status_code == 404
+        os.mkdir(os.path.join(self.directory, 'sub'))
+        assert self.client.get('/static/sub').status_code == 404
+
+
+if __name__ == "__main__":
+    unittest.main()
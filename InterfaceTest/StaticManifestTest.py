@@ -0,0 +1,37 @@
+import unittest
+import os
+import shutil
+import tempfile
+import flask
+
+
+class StaticManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.root, 'static'))
+        with open(os.path.join(self.root, 'static', 'app.css'), 'w') as f:
+            f.write('body { color: red; }')
+        self.app = flask.Flask(__name__)
+        self.app.root_path = self.root
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_no_filename(self):
+        self.assertRaises(ValueError, self.app.write_static_manifest)
+        self.assertRaises(ValueError, self.app.load_static_manifest)
+
+    def test_write_and_load(self):
+        self.app.static_manifest_file = 'manifest.json'
+        self.app.write_static_manifest()
+        version = self.app.static_manifest['app.css']
+        assert len(version) == 12
+        other = flask.Flask(__name__)
+        other.root_path = self.root
+        other.load_static_manifest('manifest.json')
+        assert other.static_manifest == {'app.css': version}
+
+
+if __name__ == "__main__":
+    unittest.main()
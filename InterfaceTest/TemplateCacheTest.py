@@ -0,0 +1,78 @@
+import unittest
+import flask
+from jinja2 import DictLoader
+
+
+class TemplateCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.jinja_env.loader = DictLoader({
+            'hello.html': 'Hello {{ user }}{{ suffix }}!'
+        })
+
+    def render(self, **context):
+        with self.app.test_request_context():
+            return flask.render_template('hello.html', _cache=True,
+                                         **context)
+
+    def test_cache_by_context(self):
+        assert self.render(user='a', suffix='') == 'Hello a!'
+        self.app.jinja_env.loader.mapping['hello.html'] = 'changed'
+        assert self.render(user='a', suffix='') == 'Hello a!'
+        assert self.render(user='b', suffix='') == 'changed'
+
+    def test_context_processor_in_key(self):
+        users = ['a', 'b']
+
+        @self.app.context_processor
+        def inject_user():
+            return dict(user=users[0], suffix='')
+
+        assert self.render() == 'Hello a!'
+        users.pop(0)
+        assert self.render() == 'Hello b!'
+
+    def test_lazy_value_in_key(self):
+        users = ['a', 'b']
+
+        @self.app.context_processor
+        def inject_user():
+            return dict(user=flask.lazy_value(lambda: users[0]), suffix='')
+
+        assert self.render() == 'Hello a!'
+        users.pop(0)
+        assert self.render() == 'Hello b!'
+
+    def test_unhashable_processor_value(self):
+        @self.app.context_processor
+        def inject_user():
+            return dict(user=['a'])
+
+        self.assertRaises(TypeError, self.render, suffix='')
+
+    def test_processors_run_once(self):
+        calls = []
+
+        @self.app.context_processor
+        def inject_user():
+            calls.append('user')
+            return dict(user='a', suffix='')
+
+        assert self.render() == 'Hello a!'
+        assert calls == ['user']
+        assert self.render() == 'Hello a!'
+        assert calls == ['user', 'user']
+
+    def test_explicit_key(self):
+        with self.app.test_request_context():
+            rv = flask.render_template('hello.html', user='a', suffix='',
+                                       _cache=('hello', 1))
+            assert rv == 'Hello a!'
+            rv = flask.render_template('hello.html', user='b', suffix='',
+                                       _cache=('hello', 1))
+            assert rv == 'Hello a!'
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import unittest
+import os
+import shutil
+import tempfile
+import flask
+from jinja2 import DictLoader, FileSystemLoader, TemplateSyntaxError
+
+
+class PrecompileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.templates = os.path.join(self.root, 'templates')
+        self.cache_dir = os.path.join(self.root, 'cache')
+        os.mkdir(self.templates)
+        os.mkdir(self.cache_dir)
+        self.write('index.html', 'Hello {{ name }}!')
+        self.write('.hidden.html', '{% broken')
+
+        class CachingFlask(flask.Flask):
+            template_bytecode_cache_dir = self.cache_dir
+        self.app = CachingFlask(__name__)
+        self.app.jinja_env.loader = FileSystemLoader(self.templates)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, source):
+        with open(os.path.join(self.templates, name), 'w') as f:
+            f.write(source)
+
+    def test_precompile(self):
+        assert self.app.precompile_templates() == ['index.html']
+        assert len(os.listdir(self.cache_dir)) == 1
+        with self.app.test_request_context():
+            assert flask.render_template('index.html', name='x') == \
+                'Hello x!'
+
+    def test_bytecode_reused(self):
+        self.app.precompile_templates()
+        other = type(self.app)(__name__)
+        other.jinja_env.loader = FileSystemLoader(self.templates)
+        bcc = other.jinja_env.bytecode_cache
+        loaded = []
+        load_bytecode = bcc.load_bytecode
+
+        def recording_load_bytecode(bucket):
+            load_bytecode(bucket)
+            loaded.append(bucket.code is not None)
+        bcc.load_bytecode = recording_load_bytecode
+        other.precompile_templates()
+        assert loaded == [True]
+
+    def test_syntax_error(self):
+        self.write('broken.html', '{% if %}')
+        self.assertRaises(TemplateSyntaxError,
+                          self.app.precompile_templates)
+
+    def test_disabled(self):
+        class NoCacheFlask(flask.Flask):
+            template_bytecode_cache_dir = False
+        app = NoCacheFlask(__name__)
+        assert app.jinja_env.bytecode_cache is None
+
+    def test_no_templates_folder(self):
+        # 这个测试模块旁边没有templates文件夹，使用默认的加载器
+        app = flask.Flask(__name__)
+        assert not os.path.isdir(os.path.join(app.root_path, 'templates'))
+        assert app.precompile_templates() == []
+        app.warm_up()
+
+
+class StreamTemplateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.jinja_env.loader = DictLoader({
+            'list.html': '{% for i in items %}<{{ i }}>{% endfor %}'
+        })
+
+    def test_stream_template(self):
+        @self.app.route('/')
+        def index():
+            return flask.stream_template('list.html', items=range(3))
+
+        assert self.app.test_client().get('/').data == b'<0><1><2>'
+        with self.app.test_request_context():
+            rv = self.app.make_response(
+                flask.stream_template('list.html', items=range(3)))
+            assert not rv.is_sequence
+
+    def test_request_context_kept(self):
+        @self.app.route('/')
+        def index():
+            return flask.stream_template_string(
+                '{% for i in items %}{{ request.path }}{% endfor %}',
+                items=range(2))
+
+        assert self.app.test_client().get('/').data == b'//'
+
+    def test_buffer(self):
+        with self.app.test_request_context():
+            chunks = list(flask.stream_template('list.html', items=range(5),
+                                                _buffer=6))
+        assert ''.join(chunks) == '<0><1><2><3><4>'
+        assert chunks == ['<0><1>', '<2><3>', '<4>']
+
+
+class LazyValueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.calls = []
+
+        @self.app.context_processor
+        def inject_user():
+            return dict(user=flask.lazy_value(self.load_user))
+
+    def load_user(self):
+        self.calls.append('load')
+        return 'bob'
+
+    def render(self, source):
+        return flask.render_template_string(source)
+
+    def test_not_computed_when_unused(self):
+        with self.app.test_request_context():
+            assert self.render('hello') == 'hello'
+        assert self.calls == []
+
+    def test_computed_once_per_request(self):
+        with self.app.test_request_context():
+            assert self.render('{{ user }} {{ user|upper }}') == 'bob BOB'
+            assert self.render('{{ user }}') == 'bob'
+        assert self.calls == ['load']
+        with self.app.test_request_context():
+            self.render('{{ user }}')
+        assert self.calls == ['load', 'load']
+
+    def test_included_template(self):
+        self.app.jinja_env.loader = DictLoader({
+            'outer.html': '{% include "inner.html" %}',
+            'inner.html': '{{ user }}'
+        })
+        with self.app.test_request_context():
+            assert flask.render_template('outer.html') == 'bob'
+
+    def test_key(self):
+        @self.app.context_processor
+        def inject_other():
+            return dict(other=flask.lazy_value(lambda: self.load_user(),
+                                               key='user'))
+        with self.app.test_request_context():
+            assert self.render('{{ other }}') == 'bob'
+            assert self.render('{{ other }}') == 'bob'
+        assert self.calls == ['load']
+
+
+if __name__ == "__main__":
+    unittest.main()
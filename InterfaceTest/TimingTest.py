@@ -0,0 +1,69 @@
+import unittest
+import time
+import flask
+from unittest import mock
+from werkzeug.test import create_environ
+from werkzeug.wsgi import FileWrapper
+
+
+class TimingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+        self.app.collect_timings = True
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        @self.app.route('/file')
+        def file():
+            return flask.send_file(__file__, conditional=False)
+
+    def test_phases(self):
+        rv = self.app.test_client().get('/')
+        assert rv.data == b'index'
+        phases = self.app.timings.get('index')
+        for name in 'match', 'preprocess', 'dispatch', 'make_response', \
+                'process_response', 'response':
+            assert phases[name].count == 1, name
+
+    def test_match_includes_routing(self):
+        self.app.response_cache = None
+        match_static_url = self.app.match_static_url
+
+        def slow_match(*args):
+            time.sleep(0.05)
+            return match_static_url(*args)
+
+        with mock.patch.object(self.app, 'match_static_url', slow_match):
+            assert self.app.test_client().get('/').data == b'index'
+        phases = self.app.timings.get('index')
+        assert phases['match'].max >= 0.05
+        assert phases['preprocess'].max < 0.05
+
+    def test_server_timing_header(self):
+        self.app.server_timing_header = True
+        rv = self.app.test_client().get('/')
+        assert 'dispatch;dur=' in rv.headers['Server-Timing']
+
+    def test_file_wrapper_kept(self):
+        environ = create_environ('/file')
+        environ['wsgi.file_wrapper'] = FileWrapper
+        app_iter = self.app(environ, lambda status, headers: None)
+        try:
+            assert isinstance(app_iter, FileWrapper)
+            assert b''.join(app_iter) == open(__file__, 'rb').read()
+        finally:
+            app_iter.close()
+        assert self.app.timings.get('file')['response'].count == 1
+
+    def test_not_found(self):
+        rv = self.app.test_client().get('/missing')
+        assert rv.status_code == 404
+        rv.close()
+        assert self.app.timings.get(None)['match'].count == 1
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import flask
+
+
+class UrlBuildCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = flask.Flask(__name__)
+
+        @self.app.route('/')
+        def index():
+            return 'index'
+
+        @self.app.route('/user/<int:id>')
+        def user(id):
+            return str(id)
+
+        @self.app.route('/value/<value>')
+        def value(value):
+            return value
+
+    def test_cached(self):
+        cache = self.app.url_build_cache
+        with self.app.test_request_context():
+            assert flask.url_for('user', id=1) == '/user/1'
+            assert cache.misses == 1
+            assert flask.url_for('user', id=1) == '/user/1'
+            assert cache.hits == 1
+            assert flask.url_for('user', id=2) == '/user/2'
+            assert flask.url_for('index', page=3) == '/?page=3'
+
+    def test_value_types_in_key(self):
+        with self.app.test_request_context():
+            assert flask.url_for('value', value=1) == '/value/1'
+            assert flask.url_for('value', value=1.0) == '/value/1.0'
+            assert flask.url_for('value', value=True) == '/value/True'
+
+    def test_external_and_host(self):
+        with self.app.test_request_context():
+            assert flask.url_for('index') == '/'
+            assert flask.url_for('index', _external=True) == \
+                'http://localhost/'
+        with self.app.test_request_context(base_url='http://example.com/app/'):
+            assert flask.url_for('index') == '/app/'
+            assert flask.url_for('index', _external=True) == \
+                'http://example.com/app/'
+
+    def test_unhashable_values(self):
+        with self.app.test_request_context():
+            assert flask.url_for('index', tag=['a', 'b']) == '/?tag=a&tag=b'
+
+    def test_cleared_when_rules_change(self):
+        with self.app.test_request_context():
+            flask.url_for('index')
+        assert len(self.app.url_build_cache) == 1
+        self.app.add_url_rule('/other', 'other')
+        assert len(self.app.url_build_cache) == 0
+
+    def test_disabled(self):
+        class NoCacheFlask(flask.Flask):
+            url_build_cache_size = 0
+        app = NoCacheFlask(__name__)
+        app.add_url_rule('/', 'index')
+        assert app.url_build_cache is None
+        with app.test_request_context():
+            assert flask.url_for('index') == '/'
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,22 +12,59 @@
     :license: BSD, see LICENSE for more details.
 """
 from __future__ import with_statement
+import gc
 import os
+import re
 import sys
+import hmac
+import time
+from time import perf_counter
+import codecs
+import queue
+import pickle
+import signal
+import socket
+import asyncio
+import selectors
+import tempfile
+import gzip
+import zlib
+import posixpath
 import mimetypes
+from io import BytesIO
+from stat import S_ISREG
+from types import GeneratorType
+from inspect import isawaitable, iscoroutinefunction
 from datetime import datetime, timedelta
-
-from itertools import chain
-from jinja2 import Environment, PackageLoader, FileSystemLoader
+from threading import Lock, Thread, local
+from hashlib import sha1
+from uuid import UUID
+from enum import Enum
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar, copy_context
+from functools import partial, update_wrapper
+
+from jinja2 import Environment, PackageLoader, FileSystemLoader, \
+     FileSystemBytecodeCache, nodes
+from jinja2.runtime import Context
+from jinja2.ext import Extension
 from werkzeug.wrappers import Request as RequestBase, Response as ResponseBase
-from werkzeug.local import LocalStack, LocalProxy
-from werkzeug.test import create_environ
+from werkzeug.local import LocalProxy
+from werkzeug.test import create_environ, run_wsgi_app
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import LimitedStream
 from werkzeug.middleware.shared_data import SharedDataMiddleware
 from werkzeug.datastructures import ImmutableDict, Headers
 from werkzeug.utils import cached_property
 from werkzeug.wsgi import wrap_file
-from werkzeug.routing import Map, Rule
-from werkzeug.exceptions import HTTPException
+from werkzeug.routing import Map, MapAdapter, Rule, RequestRedirect, \
+     PathConverter, ValidationError, parse_rule, parse_converter_args
+from werkzeug.exceptions import HTTPException, NotFound, MethodNotAllowed, \
+     BadRequest, RequestEntityTooLarge
+from werkzeug.urls import url_quote, url_decode
+from werkzeug.http import is_resource_modified, parse_range_header, \
+     parse_if_range_header, parse_accept_header, parse_etags, http_date
 from werkzeug.contrib.securecookie import SecureCookie
 
 # try to load the best simplejson implementation available.  If JSON
@@ -41,6 +78,20 @@ except ImportError:
     except ImportError:
         json_available = False
 
+# orjson is a lot faster than the json modules and is used by the default
+# JSON provider if it is installed.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# brotli is used for precompressed static files in addition to gzip if it
+# is installed.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # 这些从Werkzeug和Jinja2导入的辅助函数（utilities）没有在
 # 模块内使用，而是直接作为外部接口开放
 #from werkzeug import abort, redirect
@@ -65,21 +116,258 @@ class Request(RequestBase):
     '''
     endpoint = view_args = routing_exception = None
 
-    @property
+    @cached_property
     def module(self):
         """The name of the current module"""
         if self.endpoint and '.' in self.endpoint:
             return self.endpoint.rsplit('.', 1)[0]
 
+    @property
+    def max_content_length(self):
+        """The :attr:`~Flask.max_content_length` of the current
+        application.
+        """
+        ctx = _request_ctx_stack.top
+        if ctx is not None:
+            return ctx.app.max_content_length
+
+    @property
+    def max_form_memory_size(self):
+        """The :attr:`~Flask.max_form_memory_size` of the current
+        application.
+        """
+        ctx = _request_ctx_stack.top
+        if ctx is not None:
+            return ctx.app.max_form_memory_size
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        # 上传的文件先保存在内存中，超过upload_spool_size后才写入临时文件
+        ctx = _request_ctx_stack.top
+        max_size = ctx is not None and ctx.app.upload_spool_size or 0
+        return tempfile.SpooledTemporaryFile(max_size=max_size, mode='wb+')
+
+    def _check_content_length(self):
+        limit = self.max_content_length
+        if limit is not None and self.content_length is not None and \
+           self.content_length > limit:
+            raise RequestEntityTooLarge()
+
+    @cached_property
+    def stream(self):
+        """The body of the request.  If :attr:`~Flask.max_content_length`
+        is set, reading more bytes than that raises
+        :exc:`~werkzeug.exceptions.RequestEntityTooLarge`, also for bodies
+        sent without a ``Content-Length`` header.
+        """
+        stream = RequestBase.stream.func(self)
+        limit = self.max_content_length
+        if limit is not None:
+            stream = _CappedStream(stream, limit)
+        return stream
+
     @cached_property
     def json(self):
         """If the mimetype is `application/json` this will contain the
-        parsed JSON data.
+        parsed JSON data.  Bodies larger than
+        :attr:`~Flask.max_content_length` are rejected before they are read
+        or as soon as too much has been read.
         """
-        if __debug__:
-            _assert_have_json()
         if self.mimetype == 'application/json':
-            return json.loads(self.data)
+            self._check_content_length()
+            return current_app.json.loads(self.get_data())
+
+    def iter_json(self, lines=None, chunk_size=16384):
+        """Parses the body while it is read and yields the items of a JSON
+        array, or the values of newline delimited JSON, one at a time.  This
+        keeps only the item that is currently parsed in memory::
+
+            for row in request.iter_json():
+                store(row)
+
+        If `lines` is `None`, bodies with the mimetype
+        `application/x-ndjson` are read as newline delimited JSON and all
+        others as one JSON array.  Every line or array item is decoded
+        once, by :attr:`Flask.json`, as soon as the newline, comma or
+        bracket that ends it was read.  An empty body yields nothing.
+        Bodies larger than :attr:`~Flask.max_content_length` are rejected
+        and malformed JSON, including a line with more than one value,
+        raises :exc:`~werkzeug.exceptions.BadRequest`.
+
+        .. versionadded:: 0.3
+
+        :param lines: `True` to read newline delimited JSON, `False` to read
+                      a JSON array.
+        :param chunk_size: the number of bytes read from the body at once.
+        """
+        if lines is None:
+            lines = self.mimetype in _JSON_LINES_MIMETYPES
+        self._check_content_length()
+        read = self.stream.read
+        decode = codecs.getincrementaldecoder('utf-8')().decode
+        loads = current_app.json.loads
+        if lines:
+            iterator = _iter_json_lines(read, decode, chunk_size)
+        else:
+            iterator = _iter_json_array(read, decode, chunk_size)
+        for item in iterator:
+            try:
+                yield loads(item)
+            except ValueError:
+                raise BadRequest('Invalid JSON')
+
+
+# 按行分隔的JSON的mimetype，Request.iter_json默认按行读取这些请求
+_JSON_LINES_MIMETYPES = frozenset(['application/x-ndjson',
+                                   'application/jsonl',
+                                   'application/x-jsonlines'])
+
+# JSON数组中在字符串外面有意义的字符，和字符串里需要注意的字符
+_json_structure_re = re.compile(r'["\[\]{},]')
+_json_string_end_re = re.compile(r'["\\]')
+
+
+def _iter_json_lines(read, decode, chunk_size):
+    """Yields the non-empty lines of newline delimited JSON read with
+    `read`.  Every line is only looked at once.
+    """
+    buf = ''
+    while True:
+        chunk = read(chunk_size)
+        eof = not chunk
+        data = decode(chunk, eof)
+        if '\n' in data:
+            lines = (buf + data).split('\n')
+            buf = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield line
+        else:
+            buf += data
+        if eof:
+            break
+    if buf.strip():
+        yield buf
+
+
+def _iter_json_array(read, decode, chunk_size):
+    """Yields the source of the items of a JSON array read with `read`.
+    The body is scanned for the commas and the closing bracket that end
+    the items, skipping strings and nested values, and every character is
+    only scanned once.  The items themselves are checked when they are
+    decoded.
+    """
+    buf = ''
+    # 当前值在buf中的起始位置和已经扫描到的位置，当前值在之前的数据块中的
+    # 部分保存在pending中
+    start = scan = 0
+    pending = []
+    depth = 0
+    in_string = False
+    # 'start': 还没有读到'['，'first': 刚读到'['，'value': 读到','，
+    # 'done': 读到']'
+    expect = 'start'
+    eof = False
+    while True:
+        if expect == 'start' or expect == 'done':
+            while scan < len(buf) and buf[scan] in ' \t\r\n':
+                scan += 1
+            if scan < len(buf):
+                if expect == 'done':
+                    raise BadRequest('Unexpected data after JSON array')
+                if buf[scan] != '[':
+                    raise BadRequest('Expected a JSON array')
+                start = scan = scan + 1
+                expect = 'first'
+                continue
+            start = scan
+        elif in_string:
+            m = _json_string_end_re.search(buf, scan)
+            if m is not None:
+                if m.group() == '\\':
+                    # 跳过转义的字符，它可能在下一块数据中
+                    scan = m.end() + 1
+                else:
+                    in_string = False
+                    scan = m.end()
+                continue
+            scan = max(scan, len(buf))
+        else:
+            m = _json_structure_re.search(buf, scan)
+            if m is not None:
+                c = m.group()
+                scan = m.end()
+                if c == '"':
+                    in_string = True
+                elif c in '[{':
+                    depth += 1
+                elif depth:
+                    if c != ',':
+                        depth -= 1
+                elif c == '}':
+                    raise BadRequest('Invalid JSON array')
+                else:
+                    item = buf[start:m.start()]
+                    if pending:
+                        pending.append(item)
+                        item = ''.join(pending)
+                        del pending[:]
+                    item = item.strip()
+                    if item:
+                        yield item
+                    elif c == ',' or expect != 'first':
+                        raise BadRequest('Invalid JSON array')
+                    start = scan
+                    expect = c == ']' and 'done' or 'value'
+                continue
+            scan = len(buf)
+        if eof:
+            break
+        chunk = read(chunk_size)
+        eof = not chunk
+        if start < len(buf):
+            pending.append(buf[start:])
+        scan -= len(buf)
+        buf = decode(chunk, eof)
+        start = 0
+    if expect not in ('start', 'done'):
+        raise BadRequest('Unterminated JSON array')
+
+
+class _CappedStream(object):
+    """Wraps the input stream of a request and raises
+    :exc:`~werkzeug.exceptions.RequestEntityTooLarge` once more than `limit`
+    bytes have been read from it.
+    """
+
+    def __init__(self, stream, limit):
+        self._stream = stream
+        self.limit = limit
+        self.bytes_read = 0
+
+    def _count(self, data):
+        self.bytes_read += len(data)
+        if self.bytes_read > self.limit:
+            raise RequestEntityTooLarge()
+        return data
+
+    def read(self, size=-1):
+        if size is not None and size >= 0:
+            return self._count(self._stream.read(size))
+        chunks = []
+        while True:
+            chunk = self._count(self._stream.read(65536))
+            if not chunk:
+                return b''.join(chunks)
+            chunks.append(chunk)
+
+    def readline(self, size=-1):
+        if size is None or size < 0:
+            size = self.limit - self.bytes_read + 1
+        return self._count(self._stream.readline(size))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
 
 
 class Response(ResponseBase):
@@ -96,6 +384,207 @@ class Response(ResponseBase):
 
 class _RequestGlobals(object):
     pass
+
+
+class _EndpointPipeline(object):
+    """The module name and the hooks that run for requests to one endpoint.
+    Created by :meth:`Flask.get_pipeline`.
+    """
+    __slots__ = ('module', 'before_request_funcs', 'after_request_funcs',
+                 'context_processors')
+
+    def __init__(self, module, before_request_funcs, after_request_funcs,
+                 context_processors):
+        self.module = module
+        self.before_request_funcs = before_request_funcs
+        self.after_request_funcs = after_request_funcs
+        self.context_processors = context_processors
+
+
+class _PhaseTimer(object):
+    """Measures how long the phases of one request take."""
+    __slots__ = ('phases', 'last', 'template')
+
+    def __init__(self):
+        self.phases = []
+        self.last = perf_counter()
+        #: the time spent rendering templates, which is part of `dispatch`
+        self.template = 0.0
+
+    def lap(self, phase):
+        """Records the time since the previous lap as `phase`."""
+        now = perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def items(self):
+        rv = list(self.phases)
+        if self.template:
+            rv.append(('template', self.template))
+        return rv
+
+    def to_header(self):
+        """Formats the phases for a ``Server-Timing`` header."""
+        return ', '.join('%s;dur=%.3f' % (phase, seconds * 1000)
+                         for phase, seconds in self.items())
+
+
+class TimingHistogram(object):
+    """Counts durations in buckets that double in size, starting below
+    0.1 milliseconds.  Percentiles are estimated as the upper bound of the
+    bucket they fall into.
+
+    .. versionadded:: 0.3
+    """
+
+    #: the upper bounds of the buckets in seconds.  Longer durations are
+    #: counted in an extra bucket.
+    bounds = tuple(0.0001 * 2 ** x for x in range(20))
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        """Counts a duration."""
+        index = 0
+        bounds = self.bounds
+        while index < len(bounds) and seconds > bounds[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Returns the duration that `q` percent of the counted durations
+        did not exceed.
+        """
+        if not self.count:
+            return 0.0
+        threshold = self.count * q / 100.0
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= threshold:
+                if index < len(self.bounds):
+                    return min(self.bounds[index], self.max)
+                break
+        return self.max
+
+    def to_dict(self):
+        """Returns the count and the mean, maximum and 50th, 90th and
+        99th percentile durations in seconds.
+        """
+        return {
+            'count': self.count,
+            'mean': self.count and self.total / self.count or 0.0,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99)
+        }
+
+
+class RequestTimings(object):
+    """Collects :class:`TimingHistogram`\s of the request phases per
+    endpoint.  Available as :attr:`Flask.timings`.  The phases are
+    ``match`` (creating the request and matching the URL), ``cache`` (a
+    hit in the :attr:`~Flask.response_cache`), ``preprocess``,
+    ``dispatch``, ``template`` (rendering templates during dispatch),
+    ``make_response``, ``process_response`` (including saving the
+    session) and ``response`` (sending the body)::
+
+        >>> app.timings.summary()['index']['dispatch']['p99']
+        0.0032
+
+    Requests that did not match a URL rule are counted for the endpoint
+    `None`.
+
+    .. versionadded:: 0.3
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._histograms = {}
+
+    def record(self, endpoint, timer):
+        """Adds the phases measured by `timer` for `endpoint`."""
+        with self._lock:
+            histograms = self._histograms.get(endpoint)
+            if histograms is None:
+                histograms = self._histograms[endpoint] = {}
+            for phase, seconds in timer.items():
+                histogram = histograms.get(phase)
+                if histogram is None:
+                    histogram = histograms[phase] = TimingHistogram()
+                histogram.add(seconds)
+
+    def get(self, endpoint):
+        """Returns a dictionary of the :class:`TimingHistogram`\s of the
+        phases of `endpoint`.
+        """
+        with self._lock:
+            return dict(self._histograms.get(endpoint, ()))
+
+    def summary(self):
+        """Returns ``{endpoint: {phase: TimingHistogram.to_dict()}}``."""
+        with self._lock:
+            return dict((endpoint, dict((phase, histogram.to_dict())
+                                        for phase, histogram
+                                        in histograms.items()))
+                        for endpoint, histograms
+                        in self._histograms.items())
+
+    def reset(self):
+        """Forgets all measurements."""
+        with self._lock:
+            self._histograms.clear()
+
+
+class _TimedResponseIterable(object):
+    """Wraps the iterable of a response to measure the time until it is
+    sent and to record the timer afterwards.
+    """
+
+    def __init__(self, app_iter, timer, timings, endpoint):
+        self.app_iter = app_iter
+        self.timer = timer
+        self.timings = timings
+        self.endpoint = endpoint
+
+    def __iter__(self):
+        for item in self.app_iter:
+            yield item
+        self._record()
+
+    def close(self):
+        try:
+            if hasattr(self.app_iter, 'close'):
+                self.app_iter.close()
+        finally:
+            self._record()
+
+    def _record(self):
+        if self.timer is not None:
+            self.timer.lap('response')
+            self.timings.record(self.endpoint, self.timer)
+            self.timer = None
+
+
+class _ResponseCacheRule(object):
+    """How the responses of an endpoint are cached.  Created by
+    :meth:`Flask.cache_endpoint`.
+    """
+    __slots__ = ('timeout', 'query_args', 'vary')
+
+    def __init__(self, timeout, query_args, vary):
+        self.timeout = timeout
+        self.query_args = query_args
+        self.vary = vary
 '''
 0.2版本更新：添加Session
 '''
@@ -103,13 +592,40 @@ class _RequestGlobals(object):
 class Session(SecureCookie):
     """Expands the session with support for switching between permanent
     and non-permanent sessions.
+
+    Changes are tracked in :attr:`modified` and unmodified sessions are not
+    sent to the client again.  Changes inside mutable values like lists
+    are not detected, set :attr:`modified` to `True` yourself in that case.
     """
 
+    #: the unix timestamp when the session was last saved with a new
+    #: expiration date, `0` if it never was.  It is signed together with
+    #: the data but is not one of the keys of the session.
+    #:
+    #: .. versionadded:: 0.3
+    issued = 0
+
+    def serialize(self, expires=None):
+        if not self.issued:
+            return SecureCookie.serialize(self, expires)
+        data = Session(dict(self, _issued=self.issued), self.secret_key)
+        return SecureCookie.serialize(data, expires)
+
+    @classmethod
+    def unserialize(cls, string, secret_key):
+        rv = super(Session, cls).unserialize(string, secret_key)
+        # 绕过修改跟踪，取出签发时间不算修改session
+        rv.issued = dict.pop(rv, '_issued', 0)
+        return rv
+
     def _get_permanent(self):
         return self.get('_permanent', False)
 
     def _set_permanent(self, value):
-        self['_permanent'] = bool(value)
+        # 只有值改变时才写入，否则每次设置都会让session重新保存
+        value = bool(value)
+        if value != self.get('_permanent', False):
+            self['_permanent'] = value
 
     permanent = property(_get_permanent, _set_permanent)
     del _get_permanent, _set_permanent
@@ -130,28 +646,390 @@ class _NullSession(Session):
     del _fail
 
 
+class _LRUCache(object):
+    """A thread safe mapping that holds at most `maxsize` items and drops
+    the least recently used ones first.  Items can be given a timeout in
+    seconds after which they expire.  The number of lookups that found an
+    item and that did not are counted in :attr:`hits` and :attr:`misses`.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= time.time():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires = None
+        if timeout is not None:
+            expires = time.time() + timeout
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_if(self, predicate):
+        """Removes all items whose key matches `predicate`."""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _session_needs_refresh(app, session):
+    """Checks if an unmodified session should be saved again so that its
+    expiration date moves forward.  Sessions in the cookie only expire if
+    they are permanent, sessions in a :class:`SessionStore` always expire
+    in the store.
+    """
+    if not session.permanent and not isinstance(session, _ServerSession):
+        return False
+    age = time.time() - session.issued
+    return age >= app.permanent_session_refresh_fraction * \
+        app.permanent_session_lifetime.total_seconds()
+
+
+def _mark_session_issued(session):
+    """Remembers when a session that expires was last saved."""
+    if session.permanent or isinstance(session, _ServerSession):
+        session.issued = int(time.time())
+
+
+class _ServerSession(Session):
+    """A session whose data lives in a :class:`SessionStore`.  Only the
+    signed :attr:`sid` is sent to the client.
+    """
+
+    def __init__(self, data=None, sid=None, new=True):
+        Session.__init__(self, data, new=new)
+        #: the session id or `None` if the session was not stored yet.
+        self.sid = sid
+
+
+class SessionStore(ABC):
+    """Base class for server side session storage.  If an instance is set
+    as :attr:`Flask.session_store`, the session cookie only holds a signed
+    session id and the session data is kept by the store.  The data is
+    only written back if the session was modified.
+
+    This is an abstract base class, subclasses have to implement
+    :meth:`load`, :meth:`save` and :meth:`delete`.
+
+    .. versionadded:: 0.3
+    """
+
+    @abstractmethod
+    def load(self, sid):
+        """Returns the data for `sid` as a dictionary or `None` if there
+        is no such session or it expired.
+        """
+
+    @abstractmethod
+    def save(self, sid, data, expires):
+        """Stores the `data` dictionary for `sid` until the unix timestamp
+        `expires`.
+        """
+
+    @abstractmethod
+    def delete(self, sid):
+        """Removes the session `sid` if it exists."""
+
+    def generate_sid(self):
+        """Returns a new random session id."""
+        return os.urandom(20).hex()
+
+    def serialize(self, data):
+        # 数据保存在服务器端，不会被客户端篡改，所以可以使用pickle
+        return pickle.dumps(dict(data), pickle.HIGHEST_PROTOCOL)
+
+    def unserialize(self, string):
+        return pickle.loads(string)
+
+    def sign(self, sid, secret_key):
+        if isinstance(secret_key, str):
+            secret_key = secret_key.encode('utf-8')
+        mac = hmac.new(secret_key, sid.encode('ascii'), sha1)
+        return '%s.%s' % (sid, mac.hexdigest())
+
+    def unsign(self, value, secret_key):
+        """Returns the session id from a signed cookie value or `None` if
+        the signature does not match.
+        """
+        if not value or '.' not in value:
+            return None
+        sid = value.split('.', 1)[0]
+        try:
+            expected = self.sign(sid, secret_key)
+        except UnicodeError:
+            return None
+        if hmac.compare_digest(expected, value):
+            return sid
+
+    def open_session(self, app, request):
+        """Loads the session for `request`.  Called by
+        :meth:`Flask.open_session`.
+        """
+        sid = self.unsign(request.cookies.get(app.session_cookie_name),
+                          app.secret_key)
+        if sid is not None:
+            data = self.load(sid)
+            if data is not None:
+                issued = data.pop('_issued', 0)
+                rv = _ServerSession(data, sid=sid, new=False)
+                rv.issued = issued
+                return rv
+        return _ServerSession()
+
+    def save_session(self, app, session, response):
+        """Writes a modified session back and sets the cookie.  Called by
+        :meth:`Flask.save_session`.
+        """
+        if not session.should_save and \
+           not _session_needs_refresh(app, session):
+            return
+        if not session:
+            if session.sid is not None:
+                self.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name)
+            return
+        if session.sid is None:
+            session.sid = self.generate_sid()
+        _mark_session_issued(session)
+        # 非永久session在服务器端同样按permanent_session_lifetime过期
+        lifetime = app.permanent_session_lifetime
+        expires = None
+        if session.permanent:
+            expires = datetime.utcnow() + lifetime
+        # 签发时间和数据一起保存，但不是session的键
+        self.save(session.sid, dict(session, _issued=session.issued),
+                  time.time() + lifetime.total_seconds())
+        response.set_cookie(app.session_cookie_name,
+                            self.sign(session.sid, app.secret_key),
+                            expires=expires, httponly=True)
+
+
+class MemorySessionStore(SessionStore):
+    """Keeps sessions in the memory of the process.  At most `maxsize`
+    sessions are kept, the least recently used ones are dropped first.
+    Sessions are not shared between processes.
+
+    .. versionadded:: 0.3
+    """
+
+    def __init__(self, maxsize=10000):
+        self._cache = _LRUCache(maxsize)
+
+    def load(self, sid):
+        rv = self._cache.get(sid)
+        if rv is not None and rv[0] > time.time():
+            return self.unserialize(rv[1])
+
+    def save(self, sid, data, expires):
+        self._cache.set(sid, (expires, self.serialize(data)))
+
+    def delete(self, sid):
+        self._cache.delete(sid)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Keeps sessions in the SQLite database at `path`.  Every thread uses
+    its own connection, which is opened again in processes forked from the
+    one that opened it.  Expired sessions are ignored when loading and
+    removed by :meth:`prune`.
+
+    .. versionadded:: 0.3
+    """
+
+    def __init__(self, path, table='flask_sessions'):
+        import sqlite3
+        self._connect = lambda: sqlite3.connect(path, timeout=30)
+        self.table = table
+        self._local = local()
+        # 建表的连接不保留，程序通常在这之后才fork出工作进程
+        con = self._connect()
+        try:
+            with con:
+                con.execute('create table if not exists %s (sid text '
+                            'primary key, data blob, expires real)' % table)
+        finally:
+            con.close()
+
+    def _connection(self):
+        # SQLite的连接不能在fork出的进程中继续使用
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            self._local.connection = self._connect()
+            self._local.pid = pid
+        return self._local.connection
+
+    def load(self, sid):
+        row = self._connection().execute(
+            'select data from %s where sid = ? and expires > ?'
+            % self.table, (sid, time.time())).fetchone()
+        if row is not None:
+            return self.unserialize(row[0])
+
+    def save(self, sid, data, expires):
+        with self._connection() as con:
+            con.execute('insert or replace into %s (sid, data, expires) '
+                        'values (?, ?, ?)' % self.table,
+                        (sid, self.serialize(data), expires))
+
+    def delete(self, sid):
+        with self._connection() as con:
+            con.execute('delete from %s where sid = ?' % self.table, (sid,))
+
+    def prune(self):
+        """Removes all expired sessions."""
+        with self._connection() as con:
+            con.execute('delete from %s where expires <= ?' % self.table,
+                        (time.time(),))
+
+
+class FileSystemSessionStore(SessionStore):
+    """Keeps every session in its own file in the folder `path`.  Files
+    are replaced atomically, so concurrent processes never read a half
+    written session.
+
+    .. versionadded:: 0.3
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _filename(self, sid):
+        # 会话ID来自已验证签名的cookie，这里再确认一次它不包含路径字符
+        if not sid.isalnum():
+            raise ValueError('invalid session id')
+        return os.path.join(self.path, 'flask_session_' + sid)
+
+    def load(self, sid):
+        try:
+            with open(self._filename(sid), 'rb') as f:
+                expires, data = self.unserialize(f.read())
+        except (IOError, OSError, ValueError, EOFError, pickle.PickleError):
+            return None
+        if expires > time.time():
+            return data
+
+    def save(self, sid, data, expires):
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.flask_session_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pickle.dumps((expires, dict(data)),
+                                     pickle.HIGHEST_PROTOCOL))
+            os.replace(tmp, self._filename(sid))
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+    def delete(self, sid):
+        try:
+            os.unlink(self._filename(sid))
+        except OSError:
+            pass
+
+    def prune(self):
+        """Removes all expired sessions."""
+        now = time.time()
+        for entry in os.scandir(self.path):
+            if not entry.name.startswith('flask_session_'):
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    expires = self.unserialize(f.read())[0]
+            except (IOError, OSError, ValueError, EOFError,
+                    pickle.PickleError):
+                continue
+            if expires <= now:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+
+
 class _RequestContext(object):
     """请求上下文（request context）包含所有请求相关的信息。它会在请求进入时被创建，
     然后被推送到_request_ctx_stack，在请求结束时会被相应的移除。它会为提供的
     WSGI环境创建URL适配器（adapter）和请求对象。
+
+    URL适配器、请求对象、session和g都在第一次访问时才会创建，所以没有用到
+    session的请求不会解析session cookie。
     """
     # 会在flask.Flask.request_context和flask.Flask.test_requset_context方法中
     # 调用，以便生成请求上下文。
     def __init__(self, app, environ):
         self.app = app
-        self.url_adapter = app.url_map.bind_to_environ(environ)
-        self.request = app.request_class(environ)
-        self.session = app.open_session(self.request)
-        if self.session is None:
-            self.session = _NullSession()
-        self.g = _RequestGlobals()
+        self.environ = environ
         self.flashes = None
+        # 已经计算过的lazy_value的结果，在整个请求中复用
+        self.lazy_values = {}
+        # 开启了Flask.collect_timings时记录各个阶段耗时的_PhaseTimer
+        self.timer = None
+        # WSGI下运行异步视图和钩子的事件循环，在第一次需要时创建
+        self.event_loop = None
 
+    @cached_property
+    def url_adapter(self):
+        return self.app.url_map.bind_to_environ(self.environ)
+
+    @cached_property
+    def request(self):
+        request = self.app.request_class(self.environ)
         try:
-            self.request.endpoint, self.request.view_args = \
-                self.url_adapter.match()
+            # 不含变量部分的规则先在静态索引里查找，找不到再交给URL映射的正则匹配，
+            # 这样静态URL的请求不需要绑定URL适配器
+            rv = self.app.match_static_url(request.path, request.method)
+            if rv is None:
+                rv = self.url_adapter.match()
+            request.endpoint, request.view_args = rv
         except HTTPException as e:
-            self.request.routing_exception = e
+            request.routing_exception = e
+        return request
+
+    @cached_property
+    def session(self):
+        rv = self.app.open_session(self.request)
+        if rv is None:
+            rv = _NullSession()
+        return rv
+
+    @cached_property
+    def g(self):
+        return _RequestGlobals()
+
+    @property
+    def session_loaded(self):
+        """`True` if the session was accessed during this request."""
+        return 'session' in self.__dict__
 
     def __enter__(self):
         _request_ctx_stack.push(self)  # 将当前请求上下文对象推送到_request_ctx_stack堆栈，这个堆栈在最后定义
@@ -161,6 +1039,9 @@ class _RequestContext(object):
         # 这将允许调试器（debugger）在交互式shell中仍然可以获取请求对象。
         if tb is None or not self.app.debug:
             _request_ctx_stack.pop()
+        if self.event_loop is not None:
+            _close_event_loop(self.event_loop)
+            self.event_loop = None
 
 
 def url_for(endpoint, **values):
@@ -186,6 +1067,10 @@ def url_for(endpoint, **values):
     :param endpoint: the endpoint of the URL (name of the function)
     :param values: the variable arguments of the URL rule
     :param _external: if set to `True`, an absolute URL is generated.
+
+    .. versionchanged:: 0.3
+       URLs of static files get the hash of the file's contents appended as
+       `v` argument if :attr:`Flask.static_url_versioning` is enabled.
     """
     ctx = _request_ctx_stack.top
     if '.' not in endpoint:
@@ -195,7 +1080,29 @@ def url_for(endpoint, **values):
     elif endpoint.startswith('.'):
         endpoint = endpoint[1:]
     external = values.pop('_external', False)
-    return ctx.url_adapter.build(endpoint, values, force_external=external)
+    if endpoint == 'static' and ctx.app.static_url_versioning and \
+       'v' not in values and 'filename' in values:
+        version = ctx.app.get_static_version(values['filename'])
+        if version is not None:
+            values['v'] = version
+    adapter = ctx.url_adapter
+    cache = ctx.app.url_build_cache
+    if cache is None:
+        return adapter.build(endpoint, values, force_external=external)
+    # 值的类型也是键的一部分，否则1和1.0会生成同一个URL
+    key = (endpoint, tuple(sorted((k, v.__class__, v)
+                                  for k, v in values.items())),
+           external, adapter.url_scheme, adapter.server_name,
+           adapter.subdomain, adapter.script_name)
+    try:
+        rv = cache.get(key)
+    except TypeError:
+        # 无法哈希的值（比如列表）不缓存
+        return adapter.build(endpoint, values, force_external=external)
+    if rv is None:
+        rv = adapter.build(endpoint, values, force_external=external)
+        cache.set(key, rv)
+    return rv
 
 '''
 0.2更新：增加模板
@@ -232,6 +1139,80 @@ def flash(message):
     session.setdefault('_flashes', []).append(message)
 
 
+def copy_current_request_context(f):
+    """Binds `f` to a copy of the current context, so it sees the active
+    request when it runs somewhere that does not inherit the context of
+    the caller, like the thread pool behind
+    :meth:`asyncio.AbstractEventLoop.run_in_executor`::
+
+        loop.run_in_executor(None, copy_current_request_context(work))
+
+    Tasks created with :func:`asyncio.ensure_future` already run in a copy
+    of the context and don't need this.
+
+    .. versionadded:: 0.3
+    """
+    ctx = copy_context()
+
+    def wrapper(*args, **kwargs):
+        return ctx.run(f, *args, **kwargs)
+    return update_wrapper(wrapper, f)
+
+
+def with_etag(tag_func, weak=False):
+    """A decorator for views that can tell the ``ETag`` of their response
+    without rendering it.  `tag_func` is called with the view arguments
+    and returns the tag, or `None` to send the response without one.  If
+    the client already has the tag, ``304 Not Modified`` is sent and the
+    view is not called::
+
+        @app.route('/user/<int:user_id>/')
+        @with_etag(lambda user_id: str(get_user_version(user_id)))
+        def show_user(user_id):
+            return render_template('user.html', user=get_user(user_id))
+
+    .. versionadded:: 0.3
+
+    :param tag_func: returns the tag for the view arguments.
+    :param weak: set to `True` to send a weak tag.
+    """
+    def decorator(f):
+        if iscoroutinefunction(f):
+            async def view(*args, **kwargs):
+                tag = tag_func(*args, **kwargs)
+                if _etag_matches(tag):
+                    return _not_modified(tag, weak)
+                rv = current_app.make_response(await f(*args, **kwargs))
+                if tag is not None:
+                    rv.set_etag(tag, weak)
+                return rv
+        else:
+            def view(*args, **kwargs):
+                tag = tag_func(*args, **kwargs)
+                if _etag_matches(tag):
+                    return _not_modified(tag, weak)
+                rv = current_app.make_response(f(*args, **kwargs))
+                if tag is not None:
+                    rv.set_etag(tag, weak)
+                return rv
+        return update_wrapper(view, f)
+    return decorator
+
+
+def _etag_matches(tag):
+    """Checks if the ``If-None-Match`` header of a ``GET`` or ``HEAD``
+    request contains `tag`.
+    """
+    return tag is not None and request.method in ('GET', 'HEAD') and \
+        request.if_none_match.contains_weak(tag)
+
+
+def _not_modified(tag, weak):
+    rv = current_app.response_class(status=304)
+    rv.set_etag(tag, weak)
+    return rv
+
+
 def get_flashed_messages():
     """从session里拉取（pull）所有要闪现的消息并返回它们。在同一个请求中对这个函数的
     进一步调用会返回同样的消息。
@@ -260,26 +1241,73 @@ def jsonify(*args, **kwargs):
 
     This will send a JSON response like this to the browser::
 
-        {
-            "username": "admin",
-            "email": "admin@localhost",
-            "id": 42
-        }
+        {"username":"admin","email":"admin@localhost","id":42}
 
-    This requires Python 2.6 or an installed version of simplejson.
+    The data is encoded by the :attr:`~Flask.json` provider of the
+    application which writes compact JSON unless
+    :attr:`JSONProvider.compact` is set to `False`.
 
     .. versionadded:: 0.2
     """
-    if __debug__:
-        _assert_have_json()
-    return current_app.response_class(json.dumps(dict(*args, **kwargs),
-        indent=None if request.is_xhr else 2), mimetype='application/json')
+    return current_app.response_class(
+        current_app.json.dumps(dict(*args, **kwargs)),
+        mimetype='application/json')
+
+
+def stream_json(iterable, lines=False, buffer_size=8192):
+    """Creates a :class:`~flask.Response` that encodes the items of
+    `iterable` one after another as they are sent, so large collections
+    never have to be held in memory as one string.  The request context
+    stays available while the items are produced::
+
+        @app.route('/export')
+        def export():
+            return stream_json(row_to_dict(r) for r in query_rows())
+
+    By default a JSON array is sent.  If `lines` is `True` every item is
+    written on a line of its own with the `application/x-ndjson` mimetype.
+
+    .. versionadded:: 0.3
+
+    :param iterable: the items to encode.
+    :param lines: send newline delimited JSON instead of an array.
+    :param buffer_size: the minimum number of characters sent at once.
+                        `0` sends every item on its own.
+    """
+    dumps = current_app.json.dumps
+    if lines and not current_app.json.compact:
+        # 每个值必须在一行里，不能缩进
+        dumps = partial(dumps, indent=None)
+
+    def generate():
+        try:
+            if lines:
+                for item in iterable:
+                    yield dumps(item) + '\n'
+                return
+            yield '['
+            sep = ''
+            for item in iterable:
+                yield sep + dumps(item)
+                sep = ','
+            yield ']'
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+    rv = generate()
+    if buffer_size:
+        rv = _buffer_chunks(rv, buffer_size)
+    return current_app.response_class(
+        _stream_with_context(rv),
+        mimetype=lines and 'application/x-ndjson' or 'application/json')
 
 '''
 0.2更新：增加send_file
 '''
 def send_file(filename_or_fp, mimetype=None, as_attachment=False,
-              attachment_filename=None):
+              attachment_filename=None, conditional=True, add_etags=True,
+              hash_content=False):
     """Sends the contents of a file to the client.  This will use the
     most efficient method available and configured.  By default it will
     try to use the WSGI server's file_wrapper support.  Alternatively
@@ -312,6 +1340,16 @@ def send_file(filename_or_fp, mimetype=None, as_attachment=False,
                           a ``Content-Disposition: attachment`` header.
     :param attachment_filename: the filename for the attachment if it
                                 differs from the file's filename.
+    :param conditional: if the size and modification time of the file are
+                        known, answer ``If-None-Match`` and
+                        ``If-Modified-Since`` with ``304 Not Modified`` and
+                        ``Range`` requests with ``206 Partial Content``.
+                        (Added in 0.3)
+    :param add_etags: set to `False` to not send an ``ETag``.  (Added in 0.3)
+    :param hash_content: use a SHA-1 hash of the contents as ``ETag``
+                         instead of the size and modification time.  The
+                         hash is remembered until the file changes.
+                         (Added in 0.3)
     """
     if isinstance(filename_or_fp, str):
         filename = filename_or_fp
@@ -336,9 +1374,20 @@ def send_file(filename_or_fp, mimetype=None, as_attachment=False,
         headers.add('Content-Disposition', 'attachment',
                     filename=attachment_filename)
 
-    if current_app.use_x_sendfile and filename:
+    stat = None
+    if filename is not None and file is None:
+        stat = os.stat(filename)
+    elif hasattr(file, 'fileno'):
+        try:
+            stat = os.fstat(file.fileno())
+        except (OSError, ValueError):
+            pass
+
+    x_sendfile = current_app.use_x_sendfile and filename
+    if x_sendfile:
         if file is not None:
             file.close()
+            file = None
         headers['X-Sendfile'] = filename
         data = None
     else:
@@ -346,18 +1395,509 @@ def send_file(filename_or_fp, mimetype=None, as_attachment=False,
             file = open(filename, 'rb')
         data = wrap_file(request.environ, file)
 
-    return Response(data, mimetype=mimetype, headers=headers,
-                    direct_passthrough=True)
+    rv = Response(data, mimetype=mimetype, headers=headers,
+                  direct_passthrough=True)
+    if stat is None:
+        return rv
+
+    size = stat.st_size
+    last_modified = datetime.utcfromtimestamp(int(stat.st_mtime))
+    rv.last_modified = last_modified
+    etag = None
+    if add_etags:
+        if hash_content and filename is not None:
+            etag = _file_content_hash(filename, stat)
+        else:
+            etag = 'flask-%x-%x-%x' % (int(stat.st_mtime), size,
+                                       zlib.adler32(repr(filename).encode()))
+        rv.set_etag(etag)
+    # 使用X-Sendfile时由前端的服务器处理范围请求，conditional为False时
+    # 不处理范围请求，也就不能声明支持
+    if not x_sendfile:
+        rv.content_length = size
+        if conditional:
+            rv.headers['Accept-Ranges'] = 'bytes'
+
+    environ = request.environ
+    if not conditional or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+        return rv
+    if not is_resource_modified(environ, etag, last_modified=last_modified):
+        if file is not None:
+            file.close()
+        rv.status_code = 304
+        rv.response = []
+        rv.headers.pop('Content-Length', None)
+        return rv
+    if file is not None and 'HTTP_RANGE' in environ:
+        _process_file_range(rv, environ, file, size, etag, last_modified,
+                            mimetype)
+    return rv
+
+
+# 多个范围的请求最多处理这么多个范围，再多就发送整个文件
+_MAX_RANGES = 20
+
+# 以路径、修改时间和大小为键缓存文件内容的SHA-1
+_file_hash_cache = _LRUCache(1024)
+
+
+def _file_content_hash(filename, stat):
+    """Returns the SHA-1 of the contents of `filename`, cached until its
+    size or modification time change.
+    """
+    key = (filename, stat.st_mtime_ns, stat.st_size)
+    rv = _file_hash_cache.get(key)
+    if rv is None:
+        h = sha1()
+        with open(filename, 'rb') as f:
+            for block in iter(partial(f.read, 65536), b''):
+                h.update(block)
+        rv = h.hexdigest()
+        _file_hash_cache.set(key, rv)
+    return rv
+
+
+def _process_file_range(response, environ, file, size, etag, last_modified,
+                        mimetype):
+    """Turns `response` into a ``206 Partial Content`` or ``416 Requested
+    Range Not Satisfiable`` response for the ``Range`` header of the
+    request.  Ranges that cannot be parsed are ignored and the whole file
+    is sent.
+    """
+    if_range = parse_if_range_header(environ.get('HTTP_IF_RANGE'))
+    if if_range.date is not None:
+        if if_range.date != last_modified:
+            return
+    elif if_range.etag is not None:
+        if etag is None or if_range.etag != etag:
+            return
+    rng = parse_range_header(environ.get('HTTP_RANGE'))
+    if rng is None or rng.units != 'bytes' or len(rng.ranges) > _MAX_RANGES:
+        return
+
+    ranges = []
+    for start, stop in rng.ranges:
+        if start < 0:
+            start = max(size + start, 0)
+            stop = size
+        elif stop is None or stop > size:
+            stop = size
+        if start < stop:
+            ranges.append((start, stop))
+    if not ranges:
+        file.close()
+        response.status_code = 416
+        response.response = []
+        response.content_length = 0
+        response.headers['Content-Range'] = 'bytes */%d' % size
+        return
+
+    response.status_code = 206
+    if len(ranges) == 1:
+        start, stop = ranges[0]
+        response.headers['Content-Range'] = 'bytes %d-%d/%d' % \
+            (start, stop - 1, size)
+        response.content_length = stop - start
+        response.response = _iter_file_ranges(file, [(b'', start, stop)])
+        return
+
+    boundary = os.urandom(16).hex()
+    parts = []
+    length = 0
+    for start, stop in ranges:
+        head = ('\r\n--%s\r\nContent-Type: %s\r\n'
+                'Content-Range: bytes %d-%d/%d\r\n\r\n' %
+                (boundary, mimetype, start, stop - 1, size)).encode('latin1')
+        parts.append((head, start, stop))
+        length += len(head) + stop - start
+    tail = ('\r\n--%s--\r\n' % boundary).encode('latin1')
+    parts.append((tail, 0, 0))
+    response.content_length = length + len(tail)
+    response.headers['Content-Type'] = 'multipart/byteranges; boundary=' + \
+        boundary
+    response.response = _iter_file_ranges(file, parts)
+
+
+# 静态文件URL中作为版本号的内容哈希的长度
+_STATIC_VERSION_LENGTH = 12
+
+
+class _StaticFile(object):
+    """A file kept in memory by :class:`StaticFileCache`.  `variants`
+    maps content encodings to ``(data, etag)`` tuples.
+    """
+    __slots__ = ('mtime', 'size', 'version', 'headers', 'variants',
+                 'memory')
+
+    def __init__(self, mtime, size, version, headers, variants):
+        self.mtime = mtime
+        self.size = size
+        self.version = version
+        self.headers = headers
+        self.variants = variants
+        self.memory = sum(len(data) for data, etag in variants.values())
+
+
+class StaticFileCache(object):
+    """WSGI middleware that serves the files in `directory` below
+    `url_path` from memory.  The files are loaded by :meth:`preload`, which
+    :meth:`Flask.warm_up` calls, as long as they fit into
+    :attr:`Flask.static_cache_size` bytes, and otherwise on their first
+    request, dropping the least recently used ones when the cache is full.
+    Files larger than :attr:`Flask.static_cache_max_file_size` are always
+    read from disk.
+
+    Text files are kept gzip (and brotli, if installed) compressed as well
+    and the smallest variant accepted by the client is sent.  Every variant
+    has a strong ``ETag`` made from its contents.  Cached files are served
+    without looking at the file system, so outside of debug mode a file
+    that changes on disk is served from the cache until it is dropped with
+    :meth:`invalidate` or :meth:`clear`, which a deployment that replaces
+    static files in place has to call.  In debug mode, files are reloaded
+    when their modification time changes.
+
+    Only the `directory` given here is cached, which for
+    :attr:`Flask.static_file_cache` is the ``static`` folder of the
+    application.  Modules don't have static folders of their own.
+
+    Requests with a `v` argument that matches the version of the file that
+    :func:`url_for` adds with :attr:`Flask.static_url_versioning` are sent
+    with a ``Cache-Control`` header that allows caching them for a year.
+
+    Requests that are not for a file in `directory` are passed on to
+    `wsgi_app`.
+
+    .. versionadded:: 0.3
+    """
+
+    #: mimetypes besides ``text/*`` that are compressed.
+    compressible_types = frozenset([
+        'application/javascript', 'application/json', 'application/xml',
+        'image/svg+xml', 'application/wasm', 'application/x-font-ttf',
+        'font/ttf', 'font/otf', 'image/x-icon', 'image/vnd.microsoft.icon'
+    ])
+
+    #: files smaller than this are not compressed.
+    compress_min_size = 256
+
+    #: the gzip compression level of the cached files.
+    gzip_level = 6
+
+    #: the brotli quality of the cached files.  The highest qualities
+    #: compress only a little better but are many times slower.
+    brotli_quality = 5
+
+    def __init__(self, app, wsgi_app, url_path, directory):
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.url_path = url_path.rstrip('/') + '/'
+        self.directory = os.path.abspath(directory)
+        self._files = OrderedDict()
+        self._memory = 0
+        self._lock = Lock()
+
+    def preload(self):
+        """Loads the files in the directory into the cache until it is
+        full.  :meth:`Flask.warm_up` calls this.
+        """
+        for dirpath, dirnames, filenames in os.walk(self.directory):
+            for name in filenames:
+                filename = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(filename)
+                except OSError:
+                    continue
+                if self._memory + stat.st_size > self.app.static_cache_size:
+                    continue
+                self._get(filename, stat)
+
+    def clear(self):
+        """Removes all files from the cache.  They are loaded again from
+        disk on their next request.
+        """
+        with self._lock:
+            self._files.clear()
+            self._memory = 0
+
+    def invalidate(self, path):
+        """Removes the file at `path` below the URL path, like
+        ``'css/app.css'``, from the cache so that the next request loads it
+        from disk again.
+        """
+        filename = self.get_filename(path)
+        if filename is None:
+            return
+        with self._lock:
+            old = self._files.pop(filename, None)
+            if old is not None:
+                self._memory -= old.memory
+
+    def _load(self, filename, stat):
+        with open(filename, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+        content_type = mimetype
+        if mimetype.startswith('text/'):
+            content_type += '; charset=utf-8'
+        etag = sha1(data).hexdigest()
+        variants = {'identity': (data, '"%s"' % etag)}
+        if len(data) >= self.compress_min_size and \
+           (mimetype.startswith('text/') or
+            mimetype in self.compressible_types):
+            compressed = gzip.compress(data, self.gzip_level, mtime=0)
+            if len(compressed) < len(data):
+                variants['gzip'] = (compressed, '"%s-gzip"' % etag)
+            if brotli is not None:
+                compressed = brotli.compress(data,
+                                             quality=self.brotli_quality)
+                if len(compressed) < len(data):
+                    variants['br'] = (compressed, '"%s-br"' % etag)
+        headers = [
+            ('Content-Type', content_type),
+            ('Last-Modified', http_date(int(stat.st_mtime)))
+        ]
+        if len(variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        return _StaticFile(stat.st_mtime, stat.st_size,
+                           etag[:_STATIC_VERSION_LENGTH], headers, variants)
+
+    def _lookup(self, filename):
+        """Returns the cached file for `filename` or `None`."""
+        with self._lock:
+            rv = self._files.get(filename)
+            if rv is not None:
+                self._files.move_to_end(filename)
+        return rv
+
+    def _get(self, filename, stat=None):
+        """Returns the cached file for `filename`, loading it if needed,
+        or `None` if it is too large to be cached.
+        """
+        rv = self._lookup(filename)
+        if rv is not None and not self.app.debug:
+            return rv
+        if stat is None:
+            stat = os.stat(filename)
+        if rv is not None and rv.mtime == stat.st_mtime and \
+           rv.size == stat.st_size:
+            return rv
+        if stat.st_size > self.app.static_cache_max_file_size:
+            return None
+        rv = self._load(filename, stat)
+        limit = self.app.static_cache_size
+        with self._lock:
+            old = self._files.pop(filename, None)
+            if old is not None:
+                self._memory -= old.memory
+            if rv.memory > limit:
+                return rv
+            self._files[filename] = rv
+            self._memory += rv.memory
+            while self._memory > limit:
+                key, old = self._files.popitem(last=False)
+                self._memory -= old.memory
+        return rv
+
+    def get_filename(self, path):
+        """Returns the filename for the `path` below the URL path or
+        `None` if it points outside the directory.
+        """
+        path = posixpath.normpath('/' + path).lstrip('/')
+        if not path or path.startswith('../') or '\\' in path or \
+           '\x00' in path:
+            return None
+        return os.path.join(self.directory, *path.split('/'))
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO') or ''
+        if not path.startswith(self.url_path) or \
+           environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.wsgi_app(environ, start_response)
+        filename = self.get_filename(path[len(self.url_path):])
+        if filename is None:
+            return self.wsgi_app(environ, start_response)
+        # 缓存中的文件不需要stat，调试模式下要检查文件是否被修改过
+        entry = None
+        if not self.app.debug:
+            entry = self._lookup(filename)
+        if entry is None:
+            try:
+                stat = os.stat(filename)
+            except (OSError, ValueError):
+                stat = None
+            if stat is None or not S_ISREG(stat.st_mode):
+                return self.wsgi_app(environ, start_response)
+            entry = self._get(filename, stat)
+            if entry is None:
+                return self._send_from_disk(environ, start_response,
+                                            filename, stat)
+
+        encoding = 'identity'
+        if len(entry.variants) > 1:
+            accept = parse_accept_header(
+                environ.get('HTTP_ACCEPT_ENCODING'))
+            for name in 'br', 'gzip':
+                if name in entry.variants and accept.quality(name) > 0:
+                    encoding = name
+                    break
+        data, etag = entry.variants[encoding]
+        headers = list(entry.headers)
+        headers.append(self._cache_control(environ, entry.version))
+        headers.append(('ETag', etag))
+        if encoding != 'identity':
+            headers.append(('Content-Encoding', encoding))
+
+        if not self._is_modified(environ, etag, entry.mtime):
+            start_response('304 NOT MODIFIED', headers)
+            return []
+        headers.append(('Content-Length', str(len(data))))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return [data]
+
+    def _cache_control(self, environ, version):
+        query = environ.get('QUERY_STRING')
+        if query and 'v=' in query and url_decode(query).get('v') == version:
+            return ('Cache-Control', 'public, max-age=31536000, immutable')
+        return ('Cache-Control', 'public, max-age=%d' %
+                self.app.static_cache_timeout)
+
+    def _is_modified(self, environ, etag, mtime):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            return not parse_etags(if_none_match).contains_weak(
+                etag.strip('"'))
+        return is_resource_modified(
+            environ, last_modified=datetime.utcfromtimestamp(int(mtime)))
+
+    def _send_from_disk(self, environ, start_response, filename, stat):
+        mimetype = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+        etag = '"flask-%x-%x-%x"' % (int(stat.st_mtime), stat.st_size,
+                                     zlib.adler32(filename.encode()))
+        version = None
+        if 'v=' in environ.get('QUERY_STRING', ''):
+            version = _file_content_hash(filename, stat)[
+                :_STATIC_VERSION_LENGTH]
+        headers = [
+            ('Content-Type', mimetype),
+            ('Last-Modified', http_date(int(stat.st_mtime))),
+            self._cache_control(environ, version),
+            ('ETag', etag)
+        ]
+        if not self._is_modified(environ, etag, stat.st_mtime):
+            start_response('304 NOT MODIFIED', headers)
+            return []
+        headers.append(('Content-Length', str(stat.st_size)))
+        start_response('200 OK', headers)
+        if environ['REQUEST_METHOD'] == 'HEAD':
+            return []
+        return wrap_file(environ, open(filename, 'rb'))
+
+
+def _gzip_stream(app_iter, chunks, level):
+    """Gzip compresses the byte `chunks` while they are produced.  Every
+    chunk is flushed so that streamed responses keep arriving piece by
+    piece.  `app_iter` is closed at the end.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def _iter_file_ranges(file, parts, buffer_size=8192):
+    """Yields the bytes of every ``(head, start, stop)`` part: `head`
+    followed by the given range of `file`.  Closes the file when done.
+    """
+    try:
+        for head, start, stop in parts:
+            if head:
+                yield head
+            file.seek(start)
+            remaining = stop - start
+            while remaining > 0:
+                block = file.read(min(buffer_size, remaining))
+                if not block:
+                    break
+                remaining -= len(block)
+                yield block
+    finally:
+        file.close()
 
 
 def render_template(template_name, **context):
     """使用给定的上下文从模板（template）文件夹渲染一个模板。
 
+    如果传入了`_cache`，渲染结果会保存在:attr:`Flask.template_cache`中。
+    `_cache`为`True`时使用传入的上下文变量和上下文处理器注入的变量作为缓存键
+    （这要求所有的值都可以哈希，:func:`lazy_value`会先被计算，上下文处理器
+    每次调用只运行一次，命中缓存时也会运行），其他值会直接
+    作为缓存键使用，这时缓存键必须包含模板用到的所有上下文处理器注入的值，
+    否则一个用户的页面可能被发送给另一个用户。默认注入的request、session和g
+    不在缓存键中，缓存的模板不应该使用它们。`_cache_timeout`可以设置缓存的
+    秒数，默认使用:attr:`Flask.template_cache_timeout`::
+
+        return render_template('user.html', user=user,
+                               _cache=('user', user.id, user.updated))
+
     :param template_name: 要被渲染的模板文件名。
     :param context: 在模板上下文中应该可用（available）的变量。
     """
-    current_app.update_template_context(context)
-    return current_app.jinja_env.get_template(template_name).render(context)
+    cache_key = context.pop('_cache', None)
+    timeout = context.pop('_cache_timeout', None)
+    app = current_app._get_current_object()
+    cache = app.template_cache
+    if cache_key is not None and cache_key is not False and \
+       cache is not None:
+        updated = cache_key is True
+        if updated:
+            # 上下文处理器只运行一次，注入的值同时用于缓存键和渲染
+            app.update_template_context(context)
+            cache_key = _template_context_key(context)
+        cache_key = ('template', template_name, cache_key)
+        rv = cache.get(cache_key)
+        if rv is None:
+            if not updated:
+                app.update_template_context(context)
+            rv = _render(app.jinja_env.get_template(template_name), context)
+            if timeout is None:
+                timeout = app.template_cache_timeout
+            cache.set(cache_key, rv, timeout)
+        return rv
+    app.update_template_context(context)
+    return _render(app.jinja_env.get_template(template_name), context)
+
+
+def _template_context_key(context):
+    """Returns the cache key for ``render_template(_cache=True)`` from the
+    template `context` after the context processors updated it, leaving out
+    the values injected by the default one.
+    """
+    values = []
+    for key, value in context.items():
+        if key in _DEFAULT_CONTEXT_NAMES:
+            continue
+        if isinstance(value, _LazyValue):
+            value = value.resolve()
+        values.append((key, value))
+    try:
+        rv = tuple(sorted(values))
+        hash(rv)
+    except TypeError:
+        raise TypeError('the template context or the values of the context '
+                        'processors cannot be hashed, pass an explicit '
+                        '_cache key instead')
+    return rv
 
 
 def render_template_string(source, **context):
@@ -367,16 +1907,207 @@ def render_template_string(source, **context):
     :param context: 在模板上下文中应该可用的变量。
     """
     current_app.update_template_context(context)
-    return current_app.jinja_env.from_string(source).render(context)
+    return _render(current_app.jinja_env.from_string(source), context)
+
+
+def _render(template, context):
+    """Renders `template` and adds the time it took to the timer of the
+    request if :attr:`Flask.collect_timings` is enabled.
+    """
+    ctx = _request_ctx_stack.top
+    if ctx is None or ctx.timer is None:
+        return template.render(context)
+    start = perf_counter()
+    try:
+        return template.render(context)
+    finally:
+        ctx.timer.template += perf_counter() - start
+
+
+def stream_template(template_name, **context):
+    """Like :func:`render_template` but returns a generator that renders
+    the template piece by piece.  Return it from a view to stream the page
+    to the client while it is rendered, :meth:`~Flask.make_response` keeps
+    the request context alive until the generator is exhausted.
+
+    Jinja2 yields many small strings.  To send fewer and larger chunks pass
+    the minimal chunk size in characters as `_buffer`::
+
+        return stream_template('report.html', rows=rows, _buffer=8192)
+
+    .. versionadded:: 0.3
+
+    :param template_name: the name of the template to be rendered.
+    :param context: the variables that should be available in the
+                    context of the template.
+    """
+    buffer_size = context.pop('_buffer', None)
+    current_app.update_template_context(context)
+    rv = current_app.jinja_env.get_template(template_name).generate(context)
+    if buffer_size:
+        rv = _buffer_chunks(rv, buffer_size)
+    return rv
+
+
+def stream_template_string(source, **context):
+    """Like :func:`stream_template` but for a template source string.
+
+    .. versionadded:: 0.3
+
+    :param source: the sourcecode of the template to be rendered.
+    :param context: the variables that should be available in the
+                    context of the template.
+    """
+    buffer_size = context.pop('_buffer', None)
+    current_app.update_template_context(context)
+    rv = current_app.jinja_env.from_string(source).generate(context)
+    if buffer_size:
+        rv = _buffer_chunks(rv, buffer_size)
+    return rv
+
+
+def _buffer_chunks(gen, size):
+    """Joins the strings from `gen` into chunks of at least `size`
+    characters.
+    """
+    buf = []
+    length = 0
+    for item in gen:
+        buf.append(item)
+        length += len(item)
+        if length >= size:
+            yield ''.join(buf)
+            buf = []
+            length = 0
+    if buf:
+        yield ''.join(buf)
+
+
+def _stream_with_context(gen):
+    """Wraps `gen` so that the current request context is pushed again
+    while it is iterated after the view returned.
+    """
+    ctx = _request_ctx_stack.top
+
+    def generator():
+        _request_ctx_stack.push(ctx)
+        try:
+            for item in gen:
+                yield item
+        finally:
+            # 生成器可能在其他上下文中被关闭，只移除自己推入的请求上下文
+            if _request_ctx_stack.top is ctx:
+                _request_ctx_stack.pop()
+            if hasattr(gen, 'close'):
+                gen.close()
+    return generator()
+
+
+class _FragmentCacheExtension(Extension):
+    """Adds a ``{% cache key[, timeout] %}...{% endcache %}`` tag to Jinja2
+    that renders its body once and keeps the output in the template cache
+    of the application::
+
+        {% cache 'navigation', 600 %}
+          ...
+        {% endcache %}
+    """
+    tags = set(['cache'])
+
+    def __init__(self, environment):
+        Extension.__init__(self, environment)
+        environment.extend(template_cache=None, template_cache_timeout=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_fragment', args),
+                               [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, key, timeout, caller):
+        cache = self.environment.template_cache
+        if cache is None:
+            return caller()
+        key = ('fragment', key)
+        rv = cache.get(key)
+        if rv is None:
+            rv = caller()
+            if timeout is None:
+                timeout = self.environment.template_cache_timeout
+            cache.set(key, rv, timeout)
+        return rv
+
+
+class _LazyValue(object):
+    """A template context value that is computed on first use.  See
+    :func:`lazy_value`.
+    """
+    __slots__ = ('func', 'key')
+
+    def __init__(self, func, key):
+        self.func = func
+        self.key = key
+
+    def resolve(self):
+        reqctx = _request_ctx_stack.top
+        if reqctx is None:
+            return self.func()
+        try:
+            return reqctx.lazy_values[self.key]
+        except KeyError:
+            rv = reqctx.lazy_values[self.key] = self.func()
+            return rv
+
+
+def lazy_value(func, key=None):
+    """Wraps `func` so that a template context processor can return it
+    instead of a value.  The function is only called when a template
+    actually uses the variable and the result is reused for the rest of the
+    request::
+
+        @app.context_processor
+        def inject_user():
+            return dict(user=lazy_value(load_current_user))
+
+    The result is remembered by `key` which defaults to the function itself,
+    so processors that create a new function each time should pass a key.
+
+    .. versionadded:: 0.3
+    """
+    if key is None:
+        key = func
+    return _LazyValue(func, key)
+
+
+class _TemplateContext(Context):
+    """Jinja2 context that computes :func:`lazy_value`\s the first time
+    a template resolves their name.
+    """
+
+    def resolve_or_missing(self, key):
+        rv = Context.resolve_or_missing(self, key)
+        if rv.__class__ is _LazyValue:
+            rv = rv.resolve()
+        return rv
+
+
+# _default_template_ctx_processor注入的变量，它们不在模板缓存键中
+_DEFAULT_CONTEXT_NAMES = frozenset(['request', 'session', 'g'])
 
 
 def _default_template_ctx_processor():
     """默认的模板上下文处理器（processor）。注入request、session和g。"""
     # 把request、session和g注入到模板上下文，以便可以直接在模板中使用这些变量。
+    # session通过代理注入，模板用不到session时就不会去解析cookie
     reqctx = _request_ctx_stack.top
     return dict(
         request=reqctx.request,
-        session=reqctx.session,
+        session=session,
         g=reqctx.g
     )
 
@@ -390,6 +2121,127 @@ def _assert_have_json():
         raise RuntimeError('simplejson not installed')
 
 
+def _run_awaitable(awaitable):
+    """Runs `awaitable` to completion on the event loop of the current
+    request.  This is how async views and hooks are called from the WSGI
+    code path.  The loop is created for the first awaitable of a request
+    and closed when the request ends, so the hooks and the view of one
+    request share it and can use the same loop bound resources.
+    """
+    async def _wait():
+        return await awaitable
+    ctx = _request_ctx_stack.top
+    if ctx is None:
+        return asyncio.run(_wait())
+    if ctx.event_loop is None:
+        ctx.event_loop = asyncio.new_event_loop()
+    return ctx.event_loop.run_until_complete(_wait())
+
+
+def _close_event_loop(loop):
+    """Cancels the tasks that are left on `loop` and closes it like
+    :func:`asyncio.run` does.
+    """
+    try:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks,
+                                                   return_exceptions=True))
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        loop.close()
+
+
+def _asgi_environ(scope, body):
+    """Creates a WSGI environment for the ASGI HTTP `scope` and the
+    request `body`.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        # WSGI要求路径以latin1字符串的形式传递UTF-8字节
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8')
+                                                   .decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'asgi.scope': scope
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1')
+        value = value.decode('latin1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + (key == 'HTTP_COOKIE' and '; ' or ',') \
+                + value
+        environ[key] = value
+    return environ
+
+
+async def _run_sync(func, *args):
+    """Calls `func` in the default executor of the running event loop with
+    a copy of the current context, so that it does not block the loop but
+    still sees the active request.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        None, partial(copy_context().run, func, *args))
+
+
+async def _asgi_send_response(send, status, headers, app_iter,
+                              buffered=False):
+    """Sends a WSGI style response through the ASGI `send` callable.
+    Bodies that are not `buffered` in a list or tuple can do blocking work
+    while they are iterated and are read in the default executor.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(None, 1)[0]),
+        'headers': [(key.lower().encode('latin1'), value.encode('latin1'))
+                    for key, value in headers]
+    })
+    buffered = buffered or isinstance(app_iter, (list, tuple))
+    try:
+        if buffered:
+            for chunk in app_iter:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+        else:
+            iterator = iter(app_iter)
+            while True:
+                chunk = await _run_sync(next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+    finally:
+        if hasattr(app_iter, 'close'):
+            if buffered:
+                app_iter.close()
+            else:
+                await _run_sync(app_iter.close)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
 def _get_package_path(name):
     """返回包的路径，如果找不到则返回当前工作目录（cwd）。"""
     try:
@@ -402,14 +2254,380 @@ def _get_package_path(name):
 '''
 # figure out if simplejson escapes slashes.  This behaviour was changed
 # from one version to another without reason.
-if not json_available or '\\/' not in json.dumps('/'):
+_json_escapes_slash = json_available and '\\/' in json.dumps('/')
+
+# orjson的选项：和json模块一样接受非字符串的键，日期和dataclass交给注册的函数
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | \
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+# orjson总是自己编码的类型
+_ORJSON_NATIVE_TYPES = (UUID, Enum)
+
+
+class JSONProvider(object):
+    """Encodes and decodes JSON for :func:`jsonify`, :attr:`Request.json`
+    and the ``tojson`` template filter.  An instance is available as
+    :attr:`Flask.json`.  If `orjson` is installed it is used instead of the
+    json module.
+
+    Types the encoder does not know can be registered with
+    :meth:`register`::
+
+        app.json.register(Decimal, str)
+        app.json.register(datetime, lambda d: d.isoformat())
 
-    def _tojson_filter(*args, **kwargs):
+    To change how JSON is handled entirely subclass this class and set
+    :attr:`Flask.json_provider_class`.
+
+    .. versionadded:: 0.3
+    """
+
+    #: if this is `True` the output has no whitespace between the items.
+    #: Otherwise it is indented by two spaces.
+    compact = True
+
+    #: whether orjson is used.  It is turned off when a serializer is
+    #: registered for a type orjson always encodes itself, like
+    #: :class:`~uuid.UUID` or :class:`~enum.Enum`.
+    use_orjson = orjson is not None
+
+    def __init__(self, app):
+        self.app = app
+        self._serializers = {}
+        self._serializer_cache = {}
+
+    def register(self, type, func):
+        """Registers `func` to convert instances of `type` (and its
+        subclasses) into something that can be encoded as JSON.
+        """
+        self._serializers[type] = func
+        self._serializer_cache.clear()
+        if self.use_orjson and issubclass(type, _ORJSON_NATIVE_TYPES):
+            # orjson自己编码这些类型，不会调用注册的函数
+            self.use_orjson = False
+
+    def default(self, o):
+        """Called by the encoder for objects it cannot encode.  Looks up
+        the function registered for the type of `o`.
+        """
+        cls = o.__class__
+        func = self._serializer_cache.get(cls)
+        if func is None:
+            for base in cls.__mro__:
+                func = self._serializers.get(base)
+                if func is not None:
+                    self._serializer_cache[cls] = func
+                    break
+            else:
+                raise TypeError('Object of type %s is not JSON serializable'
+                                % cls.__name__)
+        return func(o)
+
+    def dumps(self, obj, **kwargs):
+        """Encodes `obj` to a JSON string.  Keyword arguments are passed
+        to the json module, if there are any orjson is not used.  Objects
+        orjson cannot encode, like integers with more than 64 bits, are
+        encoded by the json module, and so is any output in which orjson
+        wrote ``null`` because it encodes NaN and infinity as ``null``
+        where the json module writes ``NaN`` and ``Infinity``.  Non-ASCII
+        characters are not escaped by either module.  The only difference
+        left is the notation of floats with an exponent: the json module
+        writes ``1e-07`` and ``1e+16`` where orjson writes ``1e-7`` and
+        ``1e16``, which decode to the same values.
+        """
+        return self._dumps(obj, kwargs)[0]
+
+    def _dumps(self, obj, kwargs):
+        """Returns the JSON string and if the encoder escaped slashes."""
+        if self.use_orjson and not kwargs:
+            option = _ORJSON_OPTIONS
+            if not self.compact:
+                option |= orjson.OPT_INDENT_2
+            try:
+                rv = orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                pass
+            else:
+                # null可能来自NaN或无穷大，交给json模块处理使两者输出一致
+                if b'null' not in rv:
+                    return rv.decode('utf-8'), False
+        if __debug__:
+            _assert_have_json()
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', False)
+        if self.compact:
+            kwargs.setdefault('separators', (',', ':'))
+        else:
+            kwargs.setdefault('indent', 2)
+        return json.dumps(obj, **kwargs), _json_escapes_slash
+
+    def loads(self, s):
+        """Decodes a JSON string or bytes."""
+        if self.use_orjson:
+            try:
+                return orjson.loads(s)
+            except ValueError:
+                # orjson不接受NaN和超过64位的整数，交给json模块处理
+                pass
         if __debug__:
             _assert_have_json()
-        return json.dumps(*args, **kwargs).replace('/', '\\/')
-else:
-    _tojson_filter = json.dumps
+        if isinstance(s, bytes):
+            s = s.decode('utf-8')
+        return json.loads(s)
+
+    def tojson(self, obj, **kwargs):
+        """The ``tojson`` template filter.  Slashes are escaped so the
+        output can be placed in ``<script>`` tags.
+        """
+        rv, escaped = self._dumps(obj, kwargs)
+        if escaped:
+            return rv
+        return rv.replace('/', '\\/')
+
+
+class _RadixNode(object):
+    """A node in the tree of a :class:`RadixMap`.  Static path segments
+    are looked up in a dictionary, segments with variable parts are tried
+    in converter weight order and the rest of a rule that contains a
+    `path` converter is matched as a whole.
+    """
+    __slots__ = ('static', 'dynamic', 'tails', 'rules')
+
+    def __init__(self):
+        self.static = {}
+        self.dynamic = []
+        self.tails = []
+        self.rules = []
+
+
+def _convert_match(regex, converters, string):
+    """Matches `string` against `regex` and converts the variable parts
+    with `converters`.  Returns `None` if there is no match.
+    """
+    m = regex.match(string)
+    if m is None:
+        return None
+    values = {}
+    try:
+        for name, value in m.groupdict().items():
+            values[name] = converters[name].to_python(value)
+    except ValidationError:
+        return None
+    return values
+
+
+class RadixMap(Map):
+    """A :class:`~werkzeug.routing.Map` that matches URLs by walking a
+    tree of path segments instead of trying every rule in turn, so the
+    matching cost depends on the length of the path and not on the number
+    of rules.  URL building is left to the regular map.
+
+    To use it, set it as :attr:`~Flask.url_map_class`::
+
+        class MyFlask(Flask):
+            url_map_class = RadixMap
+
+    The `int`, `float`, `path` and default converters as well as custom
+    converters are supported, a custom converter that matches slashes has
+    to subclass :class:`~werkzeug.routing.PathConverter`.  If rules with
+    redirects, aliases or redirecting defaults are added or host matching
+    is enabled, the map falls back to the regular matcher.
+
+    .. versionadded:: 0.3
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._root = _RadixNode()
+        self._fallback = False
+        Map.__init__(self, *args, **kwargs)
+
+    def add(self, rulefactory):
+        offset = len(self._rules)
+        Map.add(self, rulefactory)
+        for rule in self._rules[offset:]:
+            self._insert(rule)
+
+    def bind(self, *args, **kwargs):
+        rv = Map.bind(self, *args, **kwargs)
+        return _RadixMapAdapter(self, rv.server_name, rv.script_name,
+                                rv.subdomain, rv.url_scheme, rv.path_info,
+                                rv.default_method, rv.query_args)
+
+    def _parse_segments(self, rule):
+        """Splits the rule into path segments.  A static segment is a
+        string, a segment with variable parts is a list of strings and
+        ``(variable, converter)`` tuples.
+        """
+        segments = [[]]
+        for converter, arguments, variable in parse_rule(rule.rule):
+            if converter is None:
+                pieces = variable.split('/')
+                if pieces[0]:
+                    segments[-1].append(pieces[0])
+                segments.extend([piece] if piece else []
+                                for piece in pieces[1:])
+            else:
+                if arguments:
+                    c_args, c_kwargs = parse_converter_args(arguments)
+                else:
+                    c_args, c_kwargs = (), {}
+                segments[-1].append((variable, rule.get_converter(
+                    variable, converter, c_args, c_kwargs)))
+        # 规则以斜线开头，第一个分段总是空的
+        segments.pop(0)
+        rv = []
+        for parts in segments:
+            if all(isinstance(part, str) for part in parts):
+                rv.append(''.join(parts))
+            else:
+                rv.append(parts)
+        return rv
+
+    def _insert(self, rule):
+        if rule.build_only:
+            return
+        if rule.redirect_to is not None or rule.alias or \
+           self.host_matching or (rule.defaults and self.redirect_defaults):
+            self._fallback = True
+            return
+        node = self._root
+        segments = self._parse_segments(rule)
+        for idx, segment in enumerate(segments):
+            if isinstance(segment, str):
+                node = node.static.setdefault(segment, _RadixNode())
+                continue
+            if any(isinstance(part[1], PathConverter)
+                   for rest in segments[idx:] if not isinstance(rest, str)
+                   for part in rest if not isinstance(part, str)):
+                pattern, converters = self._compile(segments[idx:])
+                for tail in node.tails:
+                    if tail[0].pattern == pattern:
+                        tail[2].append(rule)
+                        break
+                else:
+                    node.tails.append((re.compile(pattern), converters,
+                                       [rule]))
+                # 剩余部分作为整体匹配，按URL映射给规则排序的方式排序，这样
+                # 较长的规则（比如/<path:name>/raw）会先于/<path:name>尝试
+                node.tails.sort(key=lambda x: min(
+                    rule.match_compare_key() for rule in x[2]))
+                return
+            pattern, converters = self._compile([segment])
+            for regex, _, child in node.dynamic:
+                if regex.pattern == pattern:
+                    node = child
+                    break
+            else:
+                child = _RadixNode()
+                node.dynamic.append((re.compile(pattern), converters, child))
+                node.dynamic.sort(key=lambda x: self._weight(x[1]))
+                node = child
+        node.rules.append(rule)
+
+    def _compile(self, segments):
+        """Compiles the segments into a regular expression and returns it
+        together with the converters of its variables.
+        """
+        converters = {}
+        patterns = []
+        for segment in segments:
+            if isinstance(segment, str):
+                patterns.append(re.escape(segment))
+                continue
+            pattern = []
+            for part in segment:
+                if isinstance(part, str):
+                    pattern.append(re.escape(part))
+                else:
+                    variable, converter = part
+                    converters[variable] = converter
+                    pattern.append('(?P<%s>%s)' % (variable, converter.regex))
+            patterns.append(''.join(pattern))
+        return '^%s$' % '/'.join(patterns), converters
+
+    @staticmethod
+    def _weight(converters):
+        return max(c.weight for c in converters.values())
+
+
+class _RadixMapAdapter(MapAdapter):
+    """Matches with the tree of a :class:`RadixMap`."""
+
+    def match(self, path_info=None, method=None, return_rule=False,
+              query_args=None):
+        if self.map._fallback:
+            return MapAdapter.match(self, path_info, method, return_rule,
+                                    query_args)
+        if path_info is None:
+            path_info = self.path_info
+        elif isinstance(path_info, bytes):
+            path_info = path_info.decode(self.map.charset)
+        if query_args is None:
+            query_args = self.query_args
+        method = (method or self.default_method).upper()
+
+        segments = path_info.lstrip('/').split('/')
+        allowed = set()
+        rv = self._find(segments, method, allowed)
+        if rv is None and not allowed:
+            # 和URL映射一样处理结尾斜线：缺少斜线时重定向，多出斜线时仅在
+            # 关闭了严格斜线的规则上匹配
+            if segments[-1] == '' and len(segments) > 1:
+                rv = self._find(segments[:-1], method, set())
+                if rv is not None and rv[0].strict_slashes:
+                    rv = None
+            elif segments[-1] != '':
+                rv = self._find(segments + [''], method, set())
+                if rv is not None and rv[0].strict_slashes:
+                    raise RequestRedirect(self.make_redirect_url(
+                        url_quote(path_info, self.map.charset,
+                                  safe='/:|+') + '/', query_args))
+        if rv is None:
+            if allowed:
+                raise MethodNotAllowed(valid_methods=list(allowed))
+            raise NotFound()
+        rule, values = rv
+        if return_rule:
+            return rule, values
+        return rule.endpoint, values
+
+    def _find(self, segments, method, allowed):
+        for rules, values in self._iter_matches(self.map._root, segments, 0):
+            for rule in rules:
+                if rule.subdomain != self.subdomain:
+                    continue
+                if rule.methods is not None and method not in rule.methods:
+                    allowed.update(rule.methods)
+                    continue
+                if rule.defaults:
+                    values.update(rule.defaults)
+                return rule, values
+
+    def _iter_matches(self, node, segments, pos):
+        if pos == len(segments):
+            if node.rules:
+                yield node.rules, {}
+            return
+        segment = segments[pos]
+        child = node.static.get(segment)
+        if child is not None:
+            for item in self._iter_matches(child, segments, pos + 1):
+                yield item
+        for regex, converters, child in node.dynamic:
+            values = _convert_match(regex, converters, segment)
+            if values is None:
+                continue
+            for rules, rest in self._iter_matches(child, segments, pos + 1):
+                rest.update(values)
+                yield rules, rest
+        if node.tails:
+            rest = '/'.join(segments[pos:])
+            for regex, converters, rules in node.tails:
+                values = _convert_match(regex, converters, rest)
+                if values is not None:
+                    yield rules, values
 
 '''
 0.2更新：增加package
@@ -595,6 +2813,460 @@ class Module(_PackageBoundObject):
         self._register_events.append(func)
 
 
+class _KeepAliveRequestHandler(WSGIRequestHandler):
+    """Request handler that keeps HTTP/1.1 connections open between
+    requests.  If the application did not read the whole request body, the
+    rest is skipped, or the connection is closed if more than
+    `max_drain_size` bytes are left.
+
+    Unlike other request handlers it does not handle the connection when
+    it is created.  The :class:`ThreadPoolServer` calls
+    :meth:`handle_request` whenever the next request arrives, so that the
+    connection does not occupy a thread in between.
+    """
+    protocol_version = 'HTTP/1.1'
+    max_drain_size = 64 * 1024
+    _input = None
+
+    def __init__(self, request, client_address, server):
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        #: when the last request on the connection was finished.
+        self.idle_since = time.monotonic()
+        self.setup()
+
+    def handle_request(self):
+        """Handles the next request on the connection and returns `True`
+        if the connection stays open for more requests.
+        """
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+        except (ConnectionError, socket.timeout) as e:
+            self.connection_dropped(e)
+            return False
+        self.idle_since = time.monotonic()
+        return not self.close_connection
+
+    def has_buffered_data(self):
+        """Checks if the next request was already read from the socket
+        together with the last one, in which case a selector will not see
+        it.  Never blocks.
+        """
+        self.request.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.request.setblocking(True)
+
+    def close(self):
+        """Closes the connection."""
+        try:
+            self.finish()
+        except OSError:
+            pass
+        self.server.shutdown_request(self.request)
+
+    def make_environ(self):
+        environ = WSGIRequestHandler.make_environ(self)
+        self._input = None
+        if environ.get('HTTP_TRANSFER_ENCODING', '').strip().lower() \
+           == 'chunked':
+            self.close_connection = True
+            return environ
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            self.close_connection = True
+            return environ
+        environ['wsgi.input'] = self._input = LimitedStream(self.rfile,
+                                                            length)
+        return environ
+
+    def handle_one_request(self):
+        WSGIRequestHandler.handle_one_request(self)
+        stream = self._input
+        if stream is None or stream.is_exhausted or self.close_connection:
+            return
+        if stream.limit - stream.tell() > self.max_drain_size:
+            self.close_connection = True
+        else:
+            stream.exhaust()
+
+
+# 请求队列满时直接发送的响应
+_SERVICE_UNAVAILABLE = (
+    b'HTTP/1.1 503 Service Unavailable\r\n'
+    b'Content-Type: text/plain\r\n'
+    b'Content-Length: 19\r\n'
+    b'Retry-After: 1\r\n'
+    b'Connection: close\r\n\r\n'
+    b'Service Unavailable'
+)
+
+
+class ThreadPoolServer(BaseWSGIServer):
+    """A WSGI server that handles connections with a fixed number of
+    `threads`.  Accepted connections wait in a queue of `queue_size`
+    connections for a free thread.  If the queue is full, new connections
+    are answered with ``503 Service Unavailable`` right away instead of
+    making every client wait longer.  Connections are kept open for more
+    requests (HTTP/1.1 keep-alive) until they are idle for `idle_timeout`
+    seconds.  Idle connections wait in a selector without occupying a
+    thread and go back into the queue when the next request arrives, or
+    are closed right away when the client closes them.
+
+    .. versionadded:: 0.3
+    """
+    multithread = True
+
+    def __init__(self, host, port, app, threads=8, queue_size=64,
+                 idle_timeout=5, **kwargs):
+        kwargs.setdefault('handler', _KeepAliveRequestHandler)
+        BaseWSGIServer.__init__(self, host, port, app, **kwargs)
+        self.idle_timeout = idle_timeout
+        self.queue = queue.Queue(queue_size)
+        # 空闲的连接在选择器中等待下一个请求，_parked中是等待加入选择器的
+        # 连接，通过_wakeup唤醒选择器线程
+        self._selector = selectors.DefaultSelector()
+        self._parked = queue.Queue()
+        self._wakeup, self._wakeup_write = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ)
+        self._closed = False
+        self._watcher = Thread(target=self._watch)
+        self._watcher.daemon = True
+        self._watcher.start()
+        self.threads = []
+        for x in range(threads):
+            thread = Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def process_request(self, request, client_address):
+        self._dispatch(self.RequestHandlerClass(request, client_address,
+                                                self))
+
+    def _dispatch(self, handler):
+        try:
+            self.queue.put_nowait(handler)
+        except queue.Full:
+            try:
+                handler.finish()
+            except OSError:
+                pass
+            self.reject_request(handler.request, handler.client_address)
+
+    def reject_request(self, request, client_address):
+        """Answers a connection that does not fit into the queue."""
+        try:
+            request.sendall(_SERVICE_UNAVAILABLE)
+        except OSError:
+            pass
+        self.shutdown_request(request)
+
+    def _work(self):
+        while True:
+            handler = self.queue.get()
+            if handler is None:
+                return
+            keep_open = False
+            try:
+                # 已经读入缓冲区的请求（pipelining）要马上处理
+                while True:
+                    handler.request.settimeout(self.idle_timeout)
+                    keep_open = handler.handle_request()
+                    if not keep_open or not handler.has_buffered_data():
+                        break
+            except Exception:
+                keep_open = False
+                self.handle_error(handler.request, handler.client_address)
+            if keep_open:
+                self._park(handler)
+            else:
+                handler.close()
+
+    def _park(self, handler):
+        """Lets `handler` wait for its next request in the selector."""
+        if self._closed:
+            handler.close()
+            return
+        self._parked.put(handler)
+        try:
+            self._wakeup_write.send(b'\0')
+        except OSError:
+            pass
+
+    def _watch(self):
+        """Runs in its own thread and hands the idle connections that
+        became readable to the thread pool.  Connections that are idle for
+        longer than `idle_timeout` are closed.
+        """
+        selector = self._selector
+        next_expire = time.monotonic() + self.idle_timeout
+        while True:
+            for key, events in selector.select(min(self.idle_timeout, 1)):
+                if key.data is None:
+                    try:
+                        self._wakeup.recv(4096)
+                    except OSError:
+                        pass
+                    continue
+                selector.unregister(key.fileobj)
+                if key.data.has_buffered_data():
+                    self._dispatch(key.data)
+                else:
+                    # 客户端关闭了连接，不需要占用队列中的位置
+                    key.data.close()
+            while True:
+                try:
+                    handler = self._parked.get_nowait()
+                except queue.Empty:
+                    break
+                if handler is None:
+                    return
+                selector.register(handler.request, selectors.EVENT_READ,
+                                  handler)
+            now = time.monotonic()
+            if now >= next_expire:
+                next_expire = now + min(self.idle_timeout, 1)
+                for key in list(selector.get_map().values()):
+                    if key.data is not None and \
+                       now - key.data.idle_since > self.idle_timeout:
+                        selector.unregister(key.fileobj)
+                        key.data.close()
+
+    def server_close(self):
+        """Stops accepting connections, waits until the queued ones are
+        handled and closes the idle ones.
+        """
+        BaseWSGIServer.server_close(self)
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        self._closed = True
+        self._parked.put(None)
+        self._wakeup_write.send(b'\0')
+        self._watcher.join()
+        # 关闭还在选择器、停放队列和请求队列中的连接
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                key.data.close()
+        self._selector.close()
+        self._wakeup.close()
+        self._wakeup_write.close()
+        for q in self._parked, self.queue:
+            while True:
+                try:
+                    handler = q.get_nowait()
+                except queue.Empty:
+                    break
+                if handler is not None:
+                    handler.close()
+
+
+class PreforkServer(object):
+    """A server that forks `processes` worker processes which accept
+    connections and handle one request at a time.  The application is
+    warmed up with :meth:`Flask.warm_up` in the master process before the
+    workers are forked, and :func:`gc.freeze` keeps the objects created so
+    far out of the garbage collector so that the memory pages stay shared
+    between the workers.
+
+    The workers share one listening socket, or with `reuse_port` every
+    worker gets its own socket with ``SO_REUSEPORT`` and the kernel
+    balances the connections between them.  These sockets are opened by
+    the master so that connections waiting on them are taken over by the
+    replacement when a worker exits.  A worker exits after
+    `max_requests` requests and is replaced, which limits the effect of
+    memory leaks.  ``SIGHUP`` gracefully recycles all workers: new ones are
+    started and the old ones finish their current request before they
+    exit.  The new workers are forked from the master, which warms up the
+    application again but does not import it again, so this does not load
+    changed code; restart the server to deploy a new version.  ``SIGTERM`` and ``SIGINT`` stop the server.  Usually this is
+    started with :meth:`Flask.serve`.
+
+    If `threads` is set, every worker handles connections with a
+    :class:`ThreadPoolServer` of that many threads, otherwise one request
+    is handled at a time.
+
+    This requires :func:`os.fork`, so it is not available on Windows.
+
+    .. versionadded:: 0.3
+    """
+
+    #: the number of connections waiting to be accepted.
+    backlog = 128
+
+    def __init__(self, app, host='127.0.0.1', port=5000, processes=None,
+                 reuse_port=False, max_requests=0, threads=0,
+                 queue_size=64, idle_timeout=5):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.processes = processes or os.cpu_count() or 1
+        self.reuse_port = reuse_port
+        self.max_requests = max_requests
+        self.threads = threads
+        self.queue_size = queue_size
+        self.idle_timeout = idle_timeout
+        #: maps the process ids of the workers to their generation, which
+        #: is increased every time the workers are recycled, and their slot.
+        self.workers = {}
+        self.generation = 0
+        self._sockets = []
+        self._stopping = False
+        self._recycling = False
+
+    def listen(self, reuse_port=False):
+        """Creates the listening socket."""
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(self.backlog)
+        return sock
+
+    def serve_forever(self):
+        """Starts the workers and supervises them until the server is
+        stopped.
+        """
+        if not hasattr(os, 'fork'):
+            raise RuntimeError('the prefork server requires os.fork')
+        if self.reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise RuntimeError('SO_REUSEPORT is not supported')
+        if self.reuse_port:
+            self._sockets = [self.listen(reuse_port=True)
+                             for x in range(self.processes)]
+        else:
+            self._sockets = [self.listen()]
+        self._warm_up()
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_recycle)
+        try:
+            self._spawn_workers()
+            while not self._stopping:
+                time.sleep(0.5)
+                self._reap_workers()
+                if self._recycling:
+                    self._recycling = False
+                    self._recycle()
+                elif not self._stopping:
+                    self._spawn_workers()
+        finally:
+            for pid in list(self.workers):
+                self._kill(pid)
+            while self.workers:
+                try:
+                    pid = os.waitpid(-1, 0)[0]
+                except ChildProcessError:
+                    break
+                self.workers.pop(pid, None)
+            for sock in self._sockets:
+                sock.close()
+
+    def _warm_up(self):
+        self.app.warm_up()
+        if hasattr(gc, 'freeze'):
+            gc.collect()
+            gc.freeze()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_recycle(self, signum, frame):
+        self._recycling = True
+
+    def _recycle(self):
+        old = list(self.workers)
+        self.generation += 1
+        self._warm_up()
+        self._spawn_workers()
+        for pid in old:
+            self._kill(pid)
+
+    def _kill(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+    def _reap_workers(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.workers.clear()
+                break
+            if not pid:
+                break
+            self.workers.pop(pid, None)
+
+    def _spawn_workers(self):
+        running = set(slot for generation, slot in self.workers.values()
+                      if generation == self.generation)
+        for slot in range(self.processes):
+            if slot in running:
+                continue
+            pid = os.fork()
+            if pid:
+                self.workers[pid] = (self.generation, slot)
+                continue
+            status = 0
+            try:
+                self.run_worker(self._sockets[slot % len(self._sockets)])
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+
+    def run_worker(self, sock):
+        """Handles requests on `sock` in a worker process until it is told
+        to stop or has handled `max_requests` requests.
+        """
+        state = {'running': True, 'requests': 0}
+
+        def stop(signum, frame):
+            state['running'] = False
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+        app = self.app
+
+        def counting_app(environ, start_response):
+            state['requests'] += 1
+            return app(environ, start_response)
+
+        if self.threads:
+            server = ThreadPoolServer(self.host, self.port, counting_app,
+                                      self.threads, self.queue_size,
+                                      self.idle_timeout, fd=sock.fileno())
+        else:
+            server = BaseWSGIServer(self.host, self.port, counting_app,
+                                    fd=sock.fileno())
+        server.multiprocess = True
+        # 隔一段时间检查一次是否应该退出
+        server.timeout = 1
+        try:
+            while state['running'] and (not self.max_requests or
+                                        state['requests'] < self.max_requests):
+                server.handle_request()
+        finally:
+            server.server_close()
+
+
 class Flask(_PackageBoundObject):
     """The flask object implements a WSGI application and acts as the central
     object.  It is passed the name of the module or package of the
@@ -622,10 +3294,127 @@ class Flask(_PackageBoundObject):
     #: 用作响应对象的类。更多信息参见flask.Response。
     response_class = Response
 
+    #: the class that is used for the :attr:`url_map`.  It has to work like
+    #: a :class:`~werkzeug.routing.Map`: rules are added with `add` and
+    #: `bind_to_environ` returns an adapter that can `match` and `build`
+    #: URLs.  Set this to :class:`RadixMap` to match URLs with a tree
+    #: instead of trying every rule.
+    #:
+    #: .. versionadded:: 0.3
+    url_map_class = Map
+
+    #: the class that is used for :attr:`json`.
+    #:
+    #: .. versionadded:: 0.3
+    json_provider_class = JSONProvider
+
+    #: the number of URLs :func:`url_for` remembers per application.  Set
+    #: this to `0` to build every URL from the :attr:`url_map`.
+    #:
+    #: .. versionadded:: 0.3
+    url_build_cache_size = 1024
+
     #: 静态文件的路径。如果你不想使用静态文件，可以将这个值设为None，这样不会添加
     #: 相应的URL规则，而且开发服务器将不再提供（serve）任何静态文件。
     static_path = '/static'
 
+    #: the number of bytes of static files that are kept in memory by the
+    #: :class:`StaticFileCache`.  Set this to `0` to read every static file
+    #: from disk.
+    #:
+    #: .. versionadded:: 0.3
+    static_cache_size = 64 * 1024 * 1024
+
+    #: static files larger than this are never kept in memory.
+    #:
+    #: .. versionadded:: 0.3
+    static_cache_max_file_size = 1024 * 1024
+
+    #: the number of seconds clients may cache static files.
+    #:
+    #: .. versionadded:: 0.3
+    static_cache_timeout = 12 * 60 * 60
+
+    #: if this is `True`, :func:`url_for` adds a hash of the contents of
+    #: static files to their URLs as `v` argument, for example
+    #: ``/static/style.css?v=2fd4e1c67a2d``.  Such URLs change when the file
+    #: does, so the :class:`StaticFileCache` lets clients cache them for a
+    #: year.  The hashes are kept in :attr:`static_manifest`.
+    #:
+    #: .. versionadded:: 0.3
+    static_url_versioning = False
+
+    #: the path of a JSON file, relative to the :attr:`root_path`, with the
+    #: hashes of the static files that is loaded into the
+    #: :attr:`static_manifest` on startup if it exists.  It can be created
+    #: ahead of time with :meth:`write_static_manifest`.
+    #:
+    #: .. versionadded:: 0.3
+    static_manifest_file = None
+
+    #: set this to `True` to gzip compress responses for clients that
+    #: accept it, see :meth:`compress_response`.
+    #:
+    #: .. versionadded:: 0.3
+    compress_responses = False
+
+    #: responses with less bytes than this are not compressed.
+    #:
+    #: .. versionadded:: 0.3
+    compress_min_size = 500
+
+    #: the zlib compression level from `1` (fastest) to `9` (smallest).
+    #:
+    #: .. versionadded:: 0.3
+    compress_level = 6
+
+    #: the mimetypes of the responses that are compressed.
+    #:
+    #: .. versionadded:: 0.3
+    compress_mimetypes = frozenset([
+        'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv',
+        'text/javascript', 'application/javascript', 'application/json',
+        'application/x-ndjson', 'application/xml', 'image/svg+xml'
+    ])
+
+    #: the number of responses kept by the :attr:`response_cache`.  Set
+    #: this to `0` to disable it.
+    #:
+    #: .. versionadded:: 0.3
+    response_cache_size = 1000
+
+    #: the default number of seconds a response of an endpoint registered
+    #: with :meth:`cache_endpoint` is cached.
+    #:
+    #: .. versionadded:: 0.3
+    response_cache_timeout = 300
+
+    #: set this to `True` to measure how long the phases of every request
+    #: take.  The durations are collected per endpoint in :attr:`timings`.
+    #:
+    #: .. versionadded:: 0.3
+    collect_timings = False
+
+    #: set this to `True` to send the durations of the phases in a
+    #: ``Server-Timing`` header if :attr:`collect_timings` is enabled.  It
+    #: contains the phases up to :meth:`process_response`.
+    #:
+    #: .. versionadded:: 0.3
+    server_timing_header = False
+
+    #: set this to `True` to send an ``ETag`` made from a hash of the body
+    #: with buffered responses that don't have one yet, and to answer
+    #: requests whose ``If-None-Match`` header contains it with
+    #: ``304 Not Modified``.  See :meth:`make_conditional`.
+    #:
+    #: .. versionadded:: 0.3
+    auto_etags = False
+
+    #: set this to `True` to make the automatic ``ETag``\s weak.
+    #:
+    #: .. versionadded:: 0.3
+    auto_etags_weak = False
+
     #: 如果设置了密钥（secret key），加密组件可以使用它来为
     #: cookies或其他东西签名。比如，当你想使用安全的cookie时，把它设为一个复杂的随机值。
     secret_key = None
@@ -633,11 +3422,48 @@ class Flask(_PackageBoundObject):
     #: 安全cookie使用这个值作为session cookie的名称。
     session_cookie_name = 'session'  # 存储session对象数据的cookie名称
 
+    #: a :class:`SessionStore` that keeps the session data on the server.
+    #: If this is `None` the whole session is stored in the signed cookie.
+    #:
+    #: .. versionadded:: 0.3
+    session_store = None
+
     #: A :class:`~datetime.timedelta` which is used to set the expiration
     #: date of a permanent session.  The default is 31 days which makes a
     #: permanent session survive for roughly one month.
     permanent_session_lifetime = timedelta(days=31)
 
+    #: An unmodified permanent session is sent to the client again once
+    #: this fraction of :attr:`permanent_session_lifetime` has passed since
+    #: it was last sent, which moves its expiration date forward.  Set this
+    #: to `0` to refresh permanent sessions on every request.  Sessions in
+    #: a :attr:`session_store` expire in the store after
+    #: :attr:`permanent_session_lifetime` even if they are not permanent,
+    #: so they are refreshed in the same way.
+    #:
+    #: .. versionadded:: 0.3
+    permanent_session_refresh_fraction = 0.5
+
+    #: the maximum number of bytes a request body may have.  Larger
+    #: requests are rejected with ``413 Request Entity Too Large`` when the
+    #: form data or :attr:`Request.json` is accessed.  `None` allows bodies
+    #: of any size.
+    #:
+    #: .. versionadded:: 0.3
+    max_content_length = None
+
+    #: the maximum number of bytes of form fields (without file uploads)
+    #: that are kept in memory.  Larger forms are rejected with ``413``.
+    #:
+    #: .. versionadded:: 0.3
+    max_form_memory_size = None
+
+    #: uploaded files are kept in memory up to this many bytes and are
+    #: written to a temporary file beyond that.
+    #:
+    #: .. versionadded:: 0.3
+    upload_spool_size = 500 * 1024
+
     #: Enable this if you want to use the X-Sendfile feature.  Keep in
     #: mind that the server has to support this.  This only affects files
     #: sent with the :func:`send_file` method.
@@ -651,6 +3477,26 @@ class Flask(_PackageBoundObject):
         extensions=['jinja2.ext.autoescape', 'jinja2.ext.with_']
     )
 
+    #: the folder where Jinja2 keeps the bytecode of compiled templates so
+    #: that new processes don't have to compile them again.  `None` uses a
+    #: folder in the temporary directory of the system, `False` disables
+    #: the bytecode cache.
+    #:
+    #: .. versionadded:: 0.3
+    template_bytecode_cache_dir = None
+
+    #: the number of rendered templates and fragments that are kept in the
+    #: :attr:`template_cache`.  Set this to `0` to disable the cache.
+    #:
+    #: .. versionadded:: 0.3
+    template_cache_size = 500
+
+    #: the default number of seconds a rendered template or fragment is
+    #: cached.  `None` keeps them until they are dropped from the cache.
+    #:
+    #: .. versionadded:: 0.3
+    template_cache_timeout = 300
+
     def __init__(self, import_name):
         _PackageBoundObject.__init__(self, import_name)
 
@@ -672,15 +3518,16 @@ class Flask(_PackageBoundObject):
         #: 要注册一个错误处理器，使用errorhandler装饰器。
         self.error_handlers = {}
 
-        #: 一个应该在请求开始进入时、请求分发开始前调用的函数列表。举例来说，
+        #: 一个储存应该在请求开始进入时、请求分发开始前调用的函数列表的字典。
+        #: 字典的键是函数生效的模块名称，`None`表示对所有请求生效。举例来说，
         #: 这可以用来打开数据库连接或获取当前登录的用户。
         #: 要注册一个函数到这里，使用before_request装饰器。
-        self.before_request_funcs = []
+        self.before_request_funcs = {}
 
-        #: 一个应该在请求处理结束时调用的函数列表。这些函数会被传入当前的响应
-        #: 对象，你可以在函数内修改或替换它。
+        #: 一个储存应该在请求处理结束时调用的函数列表的字典，键的含义同上。
+        #: 这些函数会被传入当前的响应对象，你可以在函数内修改或替换它。
         #: 要注册一个函数到这里，使用after_request装饰器。
-        self.after_request_funcs = []
+        self.after_request_funcs = {}
 
         #: a dictionary with list of functions that are called without argument
         #: to populate the template context.  They key of the dictionary is the
@@ -692,7 +3539,11 @@ class Flask(_PackageBoundObject):
             None: [_default_template_ctx_processor]
         }
 
-        #: the :class:`~werkzeug.routing.Map` for this instance.  You can use
+        # 端点名到编译好的_EndpointPipeline的映射，见get_pipeline
+        self._pipelines = {}
+
+        #: the :attr:`url_map_class` instance for this application, by
+        #: default a :class:`~werkzeug.routing.Map`.  You can use
         #: this to change the routing converters after the class was created
         #: but before any routes are connected.  Example::
         #:
@@ -707,28 +3558,97 @@ class Flask(_PackageBoundObject):
         #:
         #:    app = Flask(__name__)
         #:    app.url_map.converters['list'] = ListConverter
-        self.url_map = Map()
-
+        self.url_map = self.url_map_class()
+
+        #: an index of all rules without variable parts, mapping
+        #: ``(path, method)`` to ``(endpoint, rule)``.  It is filled by
+        #: :meth:`add_url_rule` and consulted by :meth:`match_static_url`
+        #: so that the common static URLs skip the regular expression
+        #: matching of the :attr:`url_map`.
+        self.static_url_index = {}
+
+        #: the cache of URLs built by :func:`url_for` or `None` if
+        #: :attr:`url_build_cache_size` is `0`.  It is cleared whenever a
+        #: rule is added and counts its `hits` and `misses`.
+        self.url_build_cache = None
+        if self.url_build_cache_size:
+            self.url_build_cache = _LRUCache(self.url_build_cache_size)
+
+        #: the endpoints whose responses are cached, mapped to how they are
+        #: cached.  Filled by :meth:`cache_endpoint`.
+        self.response_cache_rules = {}
+
+        #: the finished responses of the endpoints in
+        #: :attr:`response_cache_rules` or `None` if
+        #: :attr:`response_cache_size` is `0`.
+        self.response_cache = None
+        if self.response_cache_size:
+            self.response_cache = _LRUCache(self.response_cache_size)
+
+        #: the :class:`RequestTimings` collected if :attr:`collect_timings`
+        #: is enabled.
+        self.timings = RequestTimings()
+
+        #: the :class:`JSONProvider` used to encode and decode JSON.
+        #:
+        #: .. versionadded:: 0.3
+        self.json = self.json_provider_class(self)
+
+        #: maps the names of static files to the hashes that
+        #: :func:`url_for` adds to their URLs if :attr:`static_url_versioning`
+        #: is enabled.  Files that are not in the manifest are hashed on
+        #: their first use.
+        self.static_manifest = {}
+        if self.static_manifest_file is not None and \
+           os.path.isfile(os.path.join(self.root_path,
+                                       self.static_manifest_file)):
+            self.load_static_manifest()
+
+        #: the :class:`StaticFileCache` that serves the static files or
+        #: `None` if they are not cached.
+        #:
+        #: .. versionadded:: 0.3
+        self.static_file_cache = None
         if self.static_path is not None:
             self.add_url_rule(self.static_path + '/<filename>',
                               build_only=True, endpoint='static')
-            if pkg_resources is not None:
-                target = (self.import_name, 'static')
+            static_folder = os.path.join(self.root_path, 'static')
+            if self.static_cache_size and os.path.isdir(static_folder):
+                # 静态文件夹在文件系统中时，把静态文件缓存在内存中
+                self.static_file_cache = StaticFileCache(
+                    self, self.wsgi_app, self.static_path, static_folder)
+                self.wsgi_app = self.static_file_cache
             else:
-                target = os.path.join(self.root_path, 'static')
-            self.wsgi_app = SharedDataMiddleware(self.wsgi_app, {  # SharedDataMiddleware中间件用来为程序添加处理静态文件的能力
-                self.static_path: target  # URL路径和实际文件目录（static文件夹）的映射
-            })
+                if pkg_resources is not None:
+                    target = (self.import_name, 'static')
+                else:
+                    target = static_folder
+                self.wsgi_app = SharedDataMiddleware(self.wsgi_app, {  # SharedDataMiddleware中间件用来为程序添加处理静态文件的能力
+                    self.static_path: target  # URL路径和实际文件目录（static文件夹）的映射
+                })
 
         #: Jinja2环境。它通过jinja_options创建，加载器（loader）通过
         #: create_jinja_loader函数返回。
-        self.jinja_env = Environment(loader=self.create_jinja_loader(),
-                                     **self.jinja_options)
+        self.jinja_env = Environment(
+            loader=self.create_jinja_loader(),
+            bytecode_cache=self.create_jinja_bytecode_cache(),
+            **self.jinja_options)
+        self.jinja_env.context_class = _TemplateContext
         self.jinja_env.globals.update(  # 将url_for和get_flashed_messages函数作为全局对象注入到模板上下文，以便在模板中调用
             url_for=url_for,
             get_flashed_messages=get_flashed_messages
         )
-        self.jinja_env.filters['tojson'] = _tojson_filter
+        self.jinja_env.filters['tojson'] = self.json.tojson
+
+        #: the cache for output of :func:`render_template` called with
+        #: `_cache` and of ``{% cache %}`` blocks in templates, or `None` if
+        #: :attr:`template_cache_size` is `0`.
+        self.template_cache = None
+        if self.template_cache_size:
+            self.template_cache = _LRUCache(self.template_cache_size)
+        self.jinja_env.add_extension(_FragmentCacheExtension)
+        self.jinja_env.template_cache = self.template_cache
+        self.jinja_env.template_cache_timeout = self.template_cache_timeout
 
     def create_jinja_loader(self):
         """创建Jinja加载器。默认只是返回一个对应配置好的包的包加载器，它会从
@@ -738,18 +3658,186 @@ class Flask(_PackageBoundObject):
             return FileSystemLoader(os.path.join(self.root_path, 'templates'))
         return PackageLoader(self.import_name)
 
+    def create_jinja_bytecode_cache(self):
+        """Creates the bytecode cache for the Jinja2 environment.  By
+        default this is a filesystem cache in
+        :attr:`template_bytecode_cache_dir`.  Override this method to use a
+        different cache, return `None` to disable it.
+
+        .. versionadded:: 0.3
+        """
+        if self.template_bytecode_cache_dir is False:
+            return None
+        return FileSystemBytecodeCache(self.template_bytecode_cache_dir)
+
+    def precompile_templates(self):
+        """Compiles every template the Jinja2 loader can find, which fills
+        the environment's template cache and the bytecode cache.  Call this
+        before the server forks its worker processes or as a build step
+        during deployment, so that the first request to each template in a
+        fresh process doesn't pay for compiling it.  Syntax errors are
+        raised right away.  Returns the names of the compiled templates, an
+        empty list if the application has no templates folder.
+
+        Modules don't have template folders of their own, so this compiles
+        what :meth:`create_jinja_loader` finds.  There is no command line
+        interface; a deployment script can run it like this::
+
+            python -c "from yourapplication import app; app.precompile_templates()"
+
+        .. versionadded:: 0.3
+        """
+        loader = self.jinja_env.loader
+        if isinstance(loader, PackageLoader) and \
+           not os.path.isdir(os.path.join(self.root_path, 'templates')):
+            # 包加载器无法列出不存在的templates文件夹
+            return []
+        try:
+            names = self.jinja_env.list_templates(
+                filter_func=lambda x: not os.path.basename(x).startswith('.'))
+        except FileNotFoundError:
+            return []
+        for name in names:
+            self.jinja_env.get_template(name)
+        return names
+
+    def get_static_version(self, filename):
+        """Returns the hash of the contents of the static file `filename`
+        that :func:`url_for` adds to its URL, or `None` if there is no such
+        file.  In debug mode the hash is updated when the file changes.
+
+        .. versionadded:: 0.3
+        """
+        rv = self.static_manifest.get(filename)
+        if rv is not None and not self.debug:
+            return rv
+        path = posixpath.normpath('/' + filename).lstrip('/')
+        path = os.path.join(self.root_path, 'static', *path.split('/'))
+        try:
+            stat = os.stat(path)
+        except (OSError, ValueError):
+            return None
+        rv = _file_content_hash(path, stat)[:_STATIC_VERSION_LENGTH]
+        self.static_manifest[filename] = rv
+        return rv
+
+    def write_static_manifest(self, filename=None):
+        """Hashes every file in the static folder and writes the
+        :attr:`static_manifest` to `filename`, which defaults to
+        :attr:`static_manifest_file`.  Run this as a build step during
+        deployment so that the application does not read the files to
+        build their URLs.  Raises :exc:`ValueError` if neither is set.
+
+        .. versionadded:: 0.3
+        """
+        path = self._static_manifest_path(filename)
+        self._hash_static_files()
+        with open(path, 'w') as f:
+            f.write(self.json.dumps(self.static_manifest))
+
+    def _hash_static_files(self):
+        static_folder = os.path.join(self.root_path, 'static')
+        for dirpath, dirnames, filenames in os.walk(static_folder):
+            for name in filenames:
+                path = os.path.relpath(os.path.join(dirpath, name),
+                                       static_folder)
+                self.get_static_version(path.replace(os.sep, '/'))
+
+    def load_static_manifest(self, filename=None):
+        """Loads the hashes written by :meth:`write_static_manifest` into
+        the :attr:`static_manifest`.  `filename` defaults to
+        :attr:`static_manifest_file`.  Raises :exc:`ValueError` if neither
+        is set.
+
+        .. versionadded:: 0.3
+        """
+        with open(self._static_manifest_path(filename), 'rb') as f:
+            self.static_manifest.update(self.json.loads(f.read()))
+
+    def _static_manifest_path(self, filename):
+        if filename is None:
+            filename = self.static_manifest_file
+        if filename is None:
+            raise ValueError('no manifest filename given and '
+                             'static_manifest_file is not set')
+        return os.path.join(self.root_path, filename)
+
+    def invalidate_template_cache(self, template_name=None):
+        """Removes the cached output of `template_name` from the
+        :attr:`template_cache`, or all cached templates and fragments if no
+        name is given.
+
+        .. versionadded:: 0.3
+        """
+        if self.template_cache is None:
+            return
+        if template_name is None:
+            self.template_cache.clear()
+        else:
+            self.template_cache.delete_if(
+                lambda key: key[0] == 'template' and key[1] == template_name)
+
+    def invalidate_template_fragment(self, key):
+        """Removes the output of the ``{% cache %}`` block with the given
+        `key` from the :attr:`template_cache`.
+
+        .. versionadded:: 0.3
+        """
+        if self.template_cache is not None:
+            self.template_cache.delete(('fragment', key))
+
     def update_template_context(self, context):
         """使用常用的变量更新模板上下文。这会注入request、session和g到模板上下文中。
+        上下文处理器返回的:func:`lazy_value`只在模板用到时才会计算。
 
         :param context: 包含额外添加的变量的字典，用来更新上下文。
         """
-        funcs = self.template_context_processors[None]
-        mod = _request_ctx_stack.top.request.module
-        if mod is not None and mod in self.template_context_processors:
-            funcs = chain(funcs, self.template_context_processors[mod])
-        for func in funcs:
+        endpoint = _request_ctx_stack.top.request.endpoint
+        for func in self.get_pipeline(endpoint).context_processors:
             context.update(func())
 
+    def get_pipeline(self, endpoint):
+        """Returns the hooks that run for requests to `endpoint`.  They are
+        looked up once per endpoint and kept until :meth:`reset_pipelines`
+        is called, which happens automatically when hooks or modules are
+        registered with the decorators or :meth:`register_module`.
+
+        .. versionadded:: 0.3
+
+        :param endpoint: the endpoint of the request or `None` if the
+                         request did not match.
+        """
+        rv = self._pipelines.get(endpoint)
+        if rv is None:
+            mod = None
+            if endpoint and '.' in endpoint:
+                mod = endpoint.rsplit('.', 1)[0]
+
+            def _funcs(registry, first, second):
+                rv = tuple(registry.get(first) or ())
+                if mod is not None:
+                    rv += tuple(registry.get(second) or ())
+                return rv
+            # before_request和上下文处理器先运行全局的函数，after_request则先运行模块的函数
+            rv = _EndpointPipeline(
+                mod,
+                _funcs(self.before_request_funcs, None, mod),
+                _funcs(self.after_request_funcs, mod, None),
+                _funcs(self.template_context_processors, None, mod)
+            )
+            self._pipelines[endpoint] = rv
+        return rv
+
+    def reset_pipelines(self):
+        """Drops the hooks remembered by :meth:`get_pipeline`.  Call this
+        if you modify :attr:`before_request_funcs`,
+        :attr:`after_request_funcs` or :attr:`template_context_processors`
+        directly.
+
+        .. versionadded:: 0.3
+        """
+        self._pipelines.clear()
+
     def run(self, host='127.0.0.1', port=5000, **options):
         """Runs the application on a local development server.  If the
         :attr:`debug` flag is set the server will automatically reload
@@ -769,6 +3857,53 @@ class Flask(_PackageBoundObject):
         options.setdefault('use_debugger', self.debug)  # 如果debug为True，开启调试器（debugger）
         return run_simple(host, port, self, **options)
 
+    def serve(self, host='127.0.0.1', port=5000, processes=None,
+              reuse_port=False, max_requests=0, threads=0, queue_size=64,
+              idle_timeout=5):
+        """Runs the application on a :class:`PreforkServer` with
+        `processes` worker processes, one per CPU by default.  With
+        `threads` every worker runs a :class:`ThreadPoolServer`.  Unlike
+        :meth:`run` this is meant for production use.
+
+        .. versionadded:: 0.3
+
+        :param host: the hostname to listen on.
+        :param port: the port of the webserver.
+        :param processes: the number of worker processes.
+        :param reuse_port: give every worker its own socket with
+                           ``SO_REUSEPORT`` instead of sharing one.
+        :param max_requests: replace a worker after this many requests.
+                             `0` keeps workers running.
+        :param threads: the number of threads per worker.  `0` handles one
+                        request at a time.
+        :param queue_size: the number of connections that wait for a free
+                           thread before new ones get a ``503`` response.
+        :param idle_timeout: the number of seconds an idle keep-alive
+                             connection is kept open.
+        """
+        PreforkServer(self, host, port, processes, reuse_port, max_requests,
+                      threads, queue_size, idle_timeout).serve_forever()
+
+    def warm_up(self):
+        """Does the work that would otherwise slow down the first
+        requests: compiles all templates, sorts the URL rules, builds the
+        hook pipelines of every endpoint, loads the static files into the
+        :attr:`static_file_cache` and hashes them if
+        :attr:`static_url_versioning` is enabled.  :meth:`serve` calls this
+        before the worker processes are forked so they share the results.
+
+        .. versionadded:: 0.3
+        """
+        self.precompile_templates()
+        self.url_map.update()
+        for rule in self.url_map.iter_rules():
+            self.get_pipeline(rule.endpoint)
+        self.get_pipeline(None)
+        if self.static_file_cache is not None:
+            self.static_file_cache.preload()
+        if self.static_url_versioning and self.static_path is not None:
+            self._hash_static_files()
+
     def test_client(self):
         """为这个程序创建一个测试客户端。"""
         from werkzeug.test import Client
@@ -781,9 +3916,12 @@ class Flask(_PackageBoundObject):
         :param request: request_class的实例。
         """
         key = self.secret_key
-        if key is not None:
-            return Session.load_cookie(request, self.session_cookie_name,
-                                       secret_key=key)
+        if key is None:
+            return None
+        if self.session_store is not None:
+            return self.session_store.open_session(self, request)
+        return Session.load_cookie(request, self.session_cookie_name,
+                                   secret_key=key)
 
     def save_session(self, session, response):
         """Saves the session if it needs updates.  For the default
@@ -794,11 +3932,18 @@ class Flask(_PackageBoundObject):
                         object)
         :param response: an instance of :attr:`response_class`
         """
+        if self.session_store is not None:
+            return self.session_store.save_session(self, session, response)
+        # 没有修改的session不需要重新签名，永久session只在过了一定时间后刷新过期时间
+        if not session.should_save and \
+           not _session_needs_refresh(self, session):
+            return
         expires = None
         if session.permanent:
+            _mark_session_issued(session)
             expires = datetime.utcnow() + self.permanent_session_lifetime
         session.save_cookie(response, self.session_cookie_name,
-                            expires=expires, httponly=True)
+                            expires=expires, httponly=True, force=True)
 
     def register_module(self, module, **options):
         """Registers a module with this application.  The keyword argument
@@ -810,6 +3955,9 @@ class Flask(_PackageBoundObject):
         state = _ModuleSetupState(self, **options)
         for func in module._register_events:
             func(state)
+        self.reset_pipelines()
+        if self.url_build_cache is not None:
+            self.url_build_cache.clear()
 
     def add_url_rule(self, rule, endpoint=None, view_func=None, **options):
         """Connects a URL rule.  Works exactly like the :meth:`route`
@@ -851,9 +3999,52 @@ class Flask(_PackageBoundObject):
             endpoint = view_func.__name__
         options['endpoint'] = endpoint
         options.setdefault('methods', ('GET',))
-        self.url_map.add(Rule(rule, **options))
+        the_rule = Rule(rule, **options)
+        self.url_map.add(the_rule)
+        self._index_static_rule(the_rule)
+        if self.url_build_cache is not None:
+            self.url_build_cache.clear()
         if view_func is not None:
             self.view_functions[endpoint] = view_func
+            cache_options = getattr(view_func, 'response_cache_options', None)
+            if cache_options is not None:
+                self.cache_endpoint(endpoint, *cache_options)
+
+    def _index_static_rule(self, rule):
+        """Adds the rule to the :attr:`static_url_index` if it can be matched
+        by a simple lookup.  Rules with converters, defaults, redirects or
+        subdomains are left to the URL map.
+        """
+        if '<' in rule.rule or rule.build_only or rule.defaults or \
+           rule.redirect_to is not None or rule.subdomain or \
+           self.url_map.host_matching:
+            return
+        methods = rule.methods
+        if methods is None:
+            methods = (None,)
+        for method in methods:
+            # 先注册的规则优先，和URL映射的行为保持一致
+            self.static_url_index.setdefault((rule.rule, method),
+                                             (rule.endpoint, rule))
+
+    def match_static_url(self, path, method):
+        """Looks up `path` in the :attr:`static_url_index`.  Returns a tuple
+        in the form ``(endpoint, view_args)`` like
+        :meth:`~werkzeug.routing.MapAdapter.match` or `None` if no static
+        rule matches, in which case the URL map has to be asked.
+
+        .. versionadded:: 0.3
+
+        :param path: the path info of the request.
+        :param method: the HTTP method of the request.
+        """
+        index = self.static_url_index
+        rv = index.get((path, method))
+        if rv is None:
+            rv = index.get((path, None))
+            if rv is None:
+                return None
+        return rv[0], {}
 
     def route(self, rule, **options):
         """一个用于为给定的URL规则注册视图函数的装饰器。示例：
@@ -954,18 +4145,149 @@ class Flask(_PackageBoundObject):
     def before_request(self, f):
         """Registers a function to run before each request."""
         self.before_request_funcs.setdefault(None, []).append(f)
+        self.reset_pipelines()
         return f
 
     def after_request(self, f):
         """Register a function to be run after each request."""
         self.after_request_funcs.setdefault(None, []).append(f)
+        self.reset_pipelines()
         return f
 
     def context_processor(self, f):
         """Registers a template context processor function."""
         self.template_context_processors[None].append(f)
+        self.reset_pipelines()
         return f
 
+    def cache_endpoint(self, endpoint, timeout=None, query_args=None,
+                       vary=()):
+        """Caches the responses of `endpoint` to ``GET`` and ``HEAD``
+        requests in the :attr:`response_cache`.  Responses are cached per
+        URL: the view arguments, the query arguments and the values of the
+        request headers named in `vary` or in the ``Vary`` header of the
+        response.  A cached response is sent without running the
+        :meth:`before_request` and :meth:`after_request` functions or the
+        view, so only cache endpoints whose responses are the same for every
+        user.  Responses that set cookies, are streamed or are not ``200 OK``
+        are never cached.
+
+        .. versionadded:: 0.3
+
+        :param endpoint: the endpoint whose responses are cached.
+        :param timeout: the number of seconds a response is cached, defaults
+                        to :attr:`response_cache_timeout`.
+        :param query_args: the names of the query arguments that change the
+                           response.  Others are ignored.  `None` uses all.
+        :param vary: the names of request headers that change the response.
+        """
+        if timeout is None:
+            timeout = self.response_cache_timeout
+        self.response_cache_rules[endpoint] = _ResponseCacheRule(
+            timeout, query_args and tuple(query_args),
+            tuple(h.lower() for h in vary))
+        self.invalidate_endpoint(endpoint)
+
+    def cache_response(self, timeout=None, query_args=None, vary=()):
+        """A decorator that caches the responses of a view function with
+        :meth:`cache_endpoint`::
+
+            @app.route('/user/<int:user_id>/')
+            @app.cache_response(timeout=60)
+            def show_user(user_id):
+                return render_template('user.html', user_id=user_id)
+
+        .. versionadded:: 0.3
+        """
+        def decorator(f):
+            f.response_cache_options = (timeout, query_args, vary)
+            for endpoint, view_func in self.view_functions.items():
+                if view_func is f:
+                    self.cache_endpoint(endpoint, timeout, query_args, vary)
+            return f
+        return decorator
+
+    def invalidate_endpoint(self, endpoint):
+        """Removes the cached responses of `endpoint` from the
+        :attr:`response_cache`.
+
+        .. versionadded:: 0.3
+        """
+        if self.response_cache is not None:
+            self.response_cache.delete_if(lambda key: key[1][0] == endpoint)
+
+    def _response_cache_key(self, request):
+        """Returns the part of the cache key that identifies the URL of
+        the request, or `None` if the response is not cached.
+        """
+        if self.response_cache is None or \
+           request.method not in ('GET', 'HEAD') or \
+           request.routing_exception is not None:
+            return None
+        rule = self.response_cache_rules.get(request.endpoint)
+        if rule is None:
+            return None
+        if rule.query_args is None:
+            query = tuple(sorted(request.args.items(multi=True)))
+        else:
+            query = tuple(tuple(request.args.getlist(name))
+                          for name in rule.query_args)
+        rv = (request.endpoint, tuple(sorted(request.view_args.items())),
+              query)
+        try:
+            hash(rv)
+        except TypeError:
+            return None
+        return rv
+
+    def _vary_values(self, environ, names):
+        return tuple(environ.get('HTTP_' + name.upper().replace('-', '_'))
+                     for name in names)
+
+    def get_cached_response(self, key, environ):
+        """Returns a new response for the cached response of the request
+        identified by `key` or `None`.
+
+        .. versionadded:: 0.3
+        """
+        names = self.response_cache.get(('vary', key))
+        if names is None:
+            return None
+        rv = self.response_cache.get(
+            ('response', key, self._vary_values(environ, names)))
+        if rv is None:
+            return None
+        status, headers, body = rv
+        rv = self.response_class(body, status=status, headers=headers)
+        if 'ETag' in rv.headers:
+            rv.make_conditional(environ)
+        return rv
+
+    def store_cached_response(self, key, response, environ):
+        """Puts `response` into the :attr:`response_cache` if it can be
+        cached.
+
+        .. versionadded:: 0.3
+        """
+        if response.status_code != 200 or not response.is_sequence or \
+           'Set-Cookie' in response.headers:
+            return
+        cache_control = response.cache_control
+        if cache_control.no_store or cache_control.private:
+            return
+        rule = self.response_cache_rules[key[0]]
+        names = set(rule.vary)
+        for name in response.vary:
+            names.add(name.lower())
+        if '*' in names:
+            return
+        names = tuple(sorted(names))
+        cache = self.response_cache
+        cache.set(('vary', key), names, rule.timeout)
+        cache.set(('response', key, self._vary_values(environ, names)),
+                  (response.status_code, list(response.headers),
+                   response.get_data()), rule.timeout)
+
     #################################
     # 下面的几个方法用于处理请求和响应
     #################################
@@ -978,7 +4300,40 @@ class Flask(_PackageBoundObject):
         try:
             if req.routing_exception is not None:
                 raise req.routing_exception
-            return self.view_functions[req.endpoint](**req.view_args)
+            rv = self.view_functions[req.endpoint](**req.view_args)
+            if isawaitable(rv):
+                # 异步视图在WSGI下运行在请求的事件循环里
+                rv = _run_awaitable(rv)
+            return rv
+        except HTTPException as e:
+            handler = self.error_handlers.get(e.code)
+            if handler is None:
+                return e
+            return handler(e)
+        except Exception as e:
+            handler = self.error_handlers.get(500)
+            if self.debug or handler is None:
+                raise
+            return handler(e)
+
+    async def dispatch_request_async(self):
+        """Like :meth:`dispatch_request` but for the ASGI code path.
+        Coroutine views are awaited, regular views run in the default
+        executor of the event loop so that they don't block it.
+
+        .. versionadded:: 0.3
+        """
+        req = _request_ctx_stack.top.request
+        try:
+            if req.routing_exception is not None:
+                raise req.routing_exception
+            view = self.view_functions[req.endpoint]
+            if iscoroutinefunction(view):
+                return await view(**req.view_args)
+            rv = await _run_sync(partial(view, **req.view_args))
+            if isawaitable(rv):
+                rv = await rv
+            return rv
         except HTTPException as e:
             handler = self.error_handlers.get(e.code)
             if handler is None:
@@ -1003,6 +4358,9 @@ class Flask(_PackageBoundObject):
                                 string encoded to utf-8 as body
         :class:`tuple`          the response object is created with the
                                 contents of the tuple as arguments
+        a generator             the response body is streamed from the
+                                generator, the request context stays
+                                available while it is iterated
         a WSGI function         the function is called as WSGI application
                                 and buffered as response object
         ======================= ===========================================
@@ -1017,6 +4375,8 @@ class Flask(_PackageBoundObject):
             return self.response_class(rv)
         if isinstance(rv, tuple):
             return self.response_class(*rv)
+        if isinstance(rv, GeneratorType):
+            return self.response_class(_stream_with_context(rv))
         return self.response_class.force_type(rv, request.environ)
 
     def preprocess_request(self):
@@ -1024,12 +4384,28 @@ class Flask(_PackageBoundObject):
         装饰的函数。如果其中某一个函数返回一个值，这个值将会作为视图返回值
         处理并停止进一步的请求处理。
         """
-        funcs = self.before_request_funcs.get(None, ())
-        mod = request.module
-        if mod and mod in self.before_request_funcs:
-            funcs = chain(funcs, self.before_request_funcs[mod])
+        funcs = self.get_pipeline(request.endpoint).before_request_funcs
         for func in funcs:
             rv = func()
+            if isawaitable(rv):
+                rv = _run_awaitable(rv)
+            if rv is not None:
+                return rv
+
+    async def preprocess_request_async(self):
+        """Like :meth:`preprocess_request` but awaits async hooks.  Regular
+        hooks run in the default executor of the event loop.
+
+        .. versionadded:: 0.3
+        """
+        funcs = self.get_pipeline(request.endpoint).before_request_funcs
+        for func in funcs:
+            if iscoroutinefunction(func):
+                rv = func()
+            else:
+                rv = await _run_sync(func)
+            if isawaitable(rv):
+                rv = await rv
             if rv is not None:
                 return rv
 
@@ -1041,16 +4417,120 @@ class Flask(_PackageBoundObject):
         :return: 一个新的响应对象或原对象，必须是response_class实例。
         """
         ctx = _request_ctx_stack.top
-        mod = ctx.request.module
-        if not isinstance(ctx.session, _NullSession):
+        if ctx.session_loaded and not isinstance(ctx.session, _NullSession):
             self.save_session(ctx.session, response)
-        funcs = ()
-        if mod and mod in self.after_request_funcs:
-            funcs = chain(funcs, self.after_request_funcs[mod])
-        if None in self.after_request_funcs:
-            funcs = chain(funcs, self.after_request_funcs[None])
-        for handler in funcs:
+        for handler in self.get_pipeline(ctx.request.endpoint) \
+                .after_request_funcs:
             response = handler(response)
+            if isawaitable(response):
+                response = _run_awaitable(response)
+        if self.auto_etags:
+            response = self.make_conditional(response)
+        if self.compress_responses:
+            response = self.compress_response(response)
+        return response
+
+    async def process_response_async(self, response):
+        """Like :meth:`process_response` but awaits async hooks.  Regular
+        hooks, saving the session, and computing the ETag or compressing the
+        response run in the default executor of the event loop.
+
+        .. versionadded:: 0.3
+        """
+        ctx = _request_ctx_stack.top
+        if ctx.session_loaded and not isinstance(ctx.session, _NullSession):
+            await _run_sync(self.save_session, ctx.session, response)
+        for handler in self.get_pipeline(ctx.request.endpoint) \
+                .after_request_funcs:
+            if iscoroutinefunction(handler):
+                response = handler(response)
+            else:
+                response = await _run_sync(handler, response)
+            if isawaitable(response):
+                response = await response
+        if self.auto_etags:
+            response = await _run_sync(self.make_conditional, response)
+        if self.compress_responses:
+            response = await _run_sync(self.compress_response, response)
+        return response
+
+    def make_conditional(self, response):
+        """Adds an ``ETag`` with the SHA-1 of the body to `response` if it
+        is a buffered ``200 OK`` response without one, and turns it into a
+        ``304 Not Modified`` response without body if the request's
+        ``If-None-Match`` or ``If-Modified-Since`` headers match.  This is
+        called by :meth:`process_response` if :attr:`auto_etags` is
+        enabled.
+
+        .. versionadded:: 0.3
+
+        :param response: a :attr:`response_class` object.
+        :return: the response.
+        """
+        request = _request_ctx_stack.top.request
+        if request.method not in ('GET', 'HEAD') or \
+           response.status_code != 200 or response.direct_passthrough:
+            return response
+        if 'ETag' not in response.headers:
+            if not response.is_sequence or 'Set-Cookie' in response.headers:
+                return response
+            h = sha1()
+            for chunk in response.iter_encoded():
+                h.update(chunk)
+            response.set_etag(h.hexdigest(), self.auto_etags_weak)
+        return response.make_conditional(request.environ)
+
+    def compress_response(self, response):
+        """Gzip compresses the body of `response` if the client accepts
+        it, its mimetype is in :attr:`compress_mimetypes` and it has at least
+        :attr:`compress_min_size` bytes.  Streamed responses are compressed
+        chunk by chunk while they are sent.  Files from :func:`send_file`,
+        partial responses and responses that already have a
+        ``Content-Encoding`` are left alone.  This is called by
+        :meth:`process_response` if :attr:`compress_responses` is enabled.
+
+        .. versionadded:: 0.3
+
+        :param response: a :attr:`response_class` object.
+        :return: the response.
+        """
+        headers = response.headers
+        if response.direct_passthrough or \
+           response.status_code < 200 or \
+           response.status_code in (204, 206, 304) or \
+           'Content-Encoding' in headers or 'X-Sendfile' in headers or \
+           'Content-Range' in headers or \
+           response.mimetype not in self.compress_mimetypes or \
+           'no-transform' in headers.get('Cache-Control', ''):
+            return response
+        buffered = response.is_sequence
+        if buffered:
+            data = response.get_data()
+            if len(data) < self.compress_min_size:
+                return response
+        elif response.content_length is not None and \
+             response.content_length < self.compress_min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        request = _request_ctx_stack.top.request
+        if not request.accept_encodings['gzip']:
+            return response
+        if buffered:
+            compressed = gzip.compress(data, self.compress_level)
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+        else:
+            response.response = _gzip_stream(response.response,
+                                             response.iter_encoded(),
+                                             self.compress_level)
+            headers.pop('Content-Length', None)
+        headers['Content-Encoding'] = 'gzip'
+        etag, weak = response.get_etag()
+        if etag is not None and not weak:
+            # 压缩后的内容和原来的不再逐字节相同
+            response.set_etag(etag, weak=True)
         return response
 
     #########################################################################
@@ -1078,13 +4558,133 @@ class Flask(_PackageBoundObject):
         """
         # 在with语句下执行相关操作，会触发_RequestContext中的__enter__方法，从而推送请求上下文到堆栈中
         with self.request_context(environ):
+            ctx = _request_ctx_stack.top
+            timer = None
+            if self.collect_timings:
+                timer = ctx.timer = _PhaseTimer()
+            # 请求对象在第一次访问时才会创建并匹配URL，这里直接访问它，让
+            # match阶段总是包含路由匹配。缓存了响应的端点直接发送缓存的响应，
+            # 跳过后面所有的处理
+            cache_key = self._response_cache_key(ctx.request)
+            if timer is not None:
+                timer.lap('match')
+            if cache_key is not None:
+                response = self.get_cached_response(cache_key, environ)
+                if response is not None:
+                    if timer is not None:
+                        timer.lap('cache')
+                        return self._timed_response(response, timer,
+                                                    environ, start_response)
+                    return response(environ, start_response)
             rv = self.preprocess_request()  # 预处理请求，调用所有使用了before_request钩子的函数
+            if timer is not None:
+                timer.lap('preprocess')
             if rv is None:
-                rv = self.dispatch_request  # 请求分发，获得视图函数返回值（或是错误处理器的返回值）
+                rv = self.dispatch_request()  # 请求分发，获得视图函数返回值（或是错误处理器的返回值）
+                if timer is not None:
+                    timer.lap('dispatch')
             response = self.make_response(rv)  # 生成响应，把上面的返回值转换成响应对象
+            if timer is not None:
+                timer.lap('make_response')
             response = self.process_response(response)  # 响应处理，调用所有使用了after_request钩子的函数
+            if cache_key is not None:
+                self.store_cached_response(cache_key, response, environ)
+            if timer is not None:
+                timer.lap('process_response')
+                return self._timed_response(response, timer, environ,
+                                            start_response)
             return response(environ, start_response)
 
+    def _timed_response(self, response, timer, environ, start_response):
+        if self.server_timing_header:
+            response.headers['Server-Timing'] = timer.to_header()
+        endpoint = _request_ctx_stack.top.request.endpoint
+        app_iter = response(environ, start_response)
+        if response.direct_passthrough:
+            # 不能包装文件，否则服务器认不出wsgi.file_wrapper，这时只记录到
+            # 交给服务器为止的时间
+            timer.lap('response')
+            self.timings.record(endpoint, timer)
+            return app_iter
+        return _TimedResponseIterable(app_iter, timer, self.timings,
+                                      endpoint)
+
+    async def asgi_app(self, scope, receive, send):
+        """The ASGI application.  It runs the same steps as
+        :meth:`wsgi_app` on the event loop of the server: `async def`
+        views and hooks are awaited, regular views run in the default
+        executor.  Static files are served by the WSGI application in the
+        executor.  Pass it to an ASGI server like this::
+
+            uvicorn myapplication:app.asgi_app
+
+        .. versionadded:: 0.3
+
+        :param scope: the ASGI connection scope
+        :param receive: an awaitable callable that returns the next event
+        :param send: an awaitable callable that sends an event
+        """
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            raise RuntimeError('unsupported ASGI scope type %r'
+                               % scope['type'])
+
+        body = []
+        size = 0
+        limit = self.max_content_length
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            # 和WSGI一样限制请求体的大小，没有Content-Length时也不会读入
+            # 过大的请求体
+            if limit is not None and size > limit:
+                response = RequestEntityTooLarge().get_response()
+                await _asgi_send_response(send, response.status,
+                                          response.get_wsgi_headers(
+                                              _asgi_environ(scope, b'')
+                                          ).to_wsgi_list(),
+                                          response.response)
+                return
+            body.append(chunk)
+            if not message.get('more_body'):
+                break
+        environ = _asgi_environ(scope, b''.join(body))
+
+        if self.static_path is not None and \
+           environ['PATH_INFO'].startswith(self.static_path + '/'):
+            app_iter, status, headers = \
+                await asyncio.get_running_loop().run_in_executor(
+                    None, run_wsgi_app, self.wsgi_app, environ)
+            await _asgi_send_response(send, status, headers, app_iter)
+            return
+
+        with self.request_context(environ):
+            cache_key = self._response_cache_key(request)
+            response = None
+            if cache_key is not None:
+                response = self.get_cached_response(cache_key, environ)
+            if response is None:
+                rv = await self.preprocess_request_async()
+                if rv is None:
+                    rv = await self.dispatch_request_async()
+                response = self.make_response(rv)
+                response = await self.process_response_async(response)
+                if cache_key is not None:
+                    self.store_cached_response(cache_key, response, environ)
+            app_iter, status, headers = response.get_wsgi_response(environ)
+            await _asgi_send_response(send, status, headers, app_iter,
+                                      response.is_sequence)
+
     def request_context(self, environ):
         """从给定的环境创建一个请求上下文，并将其绑定到当前上下文。这必须搭配with
         语句使用，因为请求仅绑定在with块中的当前上下文里。
@@ -1115,12 +4715,51 @@ class Flask(_PackageBoundObject):
 # 通过这里的调用可以获取当前请求上下文中保存的request、session等对象
 # 请求上下文在wsgi_app方法中通过with语句调用request_context方法创建并推入堆栈
 
-# 本地上下文相关的本地线程、本地堆栈和本地代理的实现这里不再展开，你需要先了解堆栈和代码在Python中的实现，
-# 然后再通过阅读Werkzeug的文档或源码了解具体实现
-# 另外，你也可以阅读《Flask Web开发实战》（helloflask.com/book）第16章16.4.3小节，这一小节首先介绍了本地线程和Werkzeug中实现的Local，
+# 堆栈保存在上下文变量（contextvars）中，而不是按线程或greenlet标识区分的本地对象里。
+# 访问上下文变量不需要查找当前线程的标识，而且asyncio的任务会自动继承创建它时的上下文
+# 你也可以阅读《Flask Web开发实战》（helloflask.com/book）第16章16.4.3小节，这一小节首先介绍了本地线程和Werkzeug中实现的Local，
 # 然后从堆栈和代理在Python中的基本实现开始，逐渐过渡到本地堆栈和本地代理的实现
-_request_ctx_stack = LocalStack()
-current_app = LocalProxy(lambda: _request_ctx_stack.top.app)
-request = LocalProxy(lambda: _request_ctx_stack.top.request)
-session = LocalProxy(lambda: _request_ctx_stack.top.session)
-g = LocalProxy(lambda: _request_ctx_stack.top.g)
+
+class _ContextStack(object):
+    """A stack with the same interface as werkzeug's
+    :class:`~werkzeug.local.LocalStack` that keeps its items in a
+    :class:`~contextvars.ContextVar`.  The stack is stored as a tuple, so
+    a copied context never shares pushes with the original one.
+    """
+
+    def __init__(self, name):
+        self._var = ContextVar(name, default=())
+
+    def push(self, obj):
+        self._var.set(self._var.get() + (obj,))
+
+    def pop(self):
+        stack = self._var.get()
+        if not stack:
+            return None
+        self._var.set(stack[:-1])
+        return stack[-1]
+
+    @property
+    def top(self):
+        stack = self._var.get()
+        if stack:
+            return stack[-1]
+
+
+def _lookup_request_attribute(var, name):
+    stack = var.get()
+    if not stack:
+        raise RuntimeError('working outside of request context')
+    return getattr(stack[-1], name)
+
+
+_request_ctx_stack = _ContextStack('flask._request_ctx_stack')
+current_app = LocalProxy(partial(_lookup_request_attribute,
+                                 _request_ctx_stack._var, 'app'))
+request = LocalProxy(partial(_lookup_request_attribute,
+                             _request_ctx_stack._var, 'request'))
+session = LocalProxy(partial(_lookup_request_attribute,
+                             _request_ctx_stack._var, 'session'))
+g = LocalProxy(partial(_lookup_request_attribute,
+                       _request_ctx_stack._var, 'g'))